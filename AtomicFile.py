@@ -0,0 +1,38 @@
+import os
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = 'w') -> Iterator[IO]:
+    """
+    Description:
+    Open a temporary file next to path for writing, and rename it over path once the with block
+    succeeds, so readers see either the old or the new contents and never a partial file. The
+    temporary file is named after the process, so concurrent writers never share one, and it is
+    removed if the block fails.
+
+    Parameters:
+    - path: The file to write.
+    - mode: 'w' for UTF-8 text or 'wb' for bytes.
+
+    Return:
+    - file: The open temporary file.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, mode, encoding=None if 'b' in mode else 'utf-8') as file:
+            yield file
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_text(path: str, text: str):
+    """
+    Write a UTF-8 text file atomically (see atomic_open).
+    """
+    with atomic_open(path) as file:
+        file.write(text)
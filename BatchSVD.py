@@ -0,0 +1,105 @@
+import numpy as np
+from typing import List, Tuple
+
+
+def stack_blocks(term_matrices: List) -> Tuple['scipy.sparse.csr_matrix', np.ndarray, np.ndarray]:
+    """
+    Description:
+    Stack the term-sentence matrices of several cases into one block-diagonal sparse matrix.
+    Columns that no sentence uses are dropped, so the width is the number of distinct
+    (case, term) pairs rather than the number of cases times the vocabulary size.
+
+    Parameters:
+    - term_matrices: List of sparse (sentences x terms) matrices, one per case. They may share
+                     a corpus vocabulary or each have their own.
+
+    Return:
+    - stacked: The compact block-diagonal matrix (all sentences x used columns).
+    - row_blocks: The case index of every row.
+    - column_blocks: The case index of every column.
+    """
+    import scipy.sparse as sp
+
+    row_counts = [matrix.shape[0] for matrix in term_matrices]
+    column_offsets = np.cumsum([0] + [matrix.shape[1] for matrix in term_matrices])
+    row_blocks = np.repeat(np.arange(len(term_matrices)), row_counts)
+
+    stacked = sp.block_diag([sp.csr_matrix(matrix) for matrix in term_matrices], format='csr')
+    used_columns, column_index = np.unique(stacked.indices, return_inverse=True)
+    stacked = sp.csr_matrix((stacked.data, column_index.ravel(), stacked.indptr),
+                            shape=(stacked.shape[0], len(used_columns)))
+    column_blocks = np.searchsorted(column_offsets, used_columns, side='right') - 1
+    return stacked, row_blocks, column_blocks
+
+
+def _block_norms(values: np.ndarray, blocks: np.ndarray, n_blocks: int) -> np.ndarray:
+    return np.sqrt(np.bincount(blocks, weights=values * values, minlength=n_blocks))
+
+
+def batched_leading_svd(term_matrices: List, max_iter: int = 200, tol: float = 1e-12) -> List[np.ndarray]:
+    """
+    Description:
+    Compute the leading singular triplet of every case at once by power iteration on the
+    block-diagonal stack, using only sparse matrix-vector products and per-block reductions.
+    The result follows TruncatedSVD's conventions (sign chosen so the largest term weight is
+    positive, output = X @ v), so LSA.summarize_svd ranks sentences as it would after
+    LSA.apply_svd with one exact component. Cases whose vector has not converged after max_iter
+    (a leading singular value barely above the second) are recomputed with an exact ARPACK
+    TruncatedSVD of their own block.
+
+    Parameters:
+    - term_matrices: List of sparse (sentences x terms) matrices, one per case.
+    - max_iter: Maximum number of power iterations.
+    - tol: Iteration stops once no case's singular vector moves more than this (squared norm).
+
+    Return:
+    - svd_matrices: List of (sentences x 1) arrays, one per case.
+    """
+    n_blocks = len(term_matrices)
+    if n_blocks == 0:
+        return []
+    stacked, row_blocks, column_blocks = stack_blocks(term_matrices)
+    stacked_t = stacked.T.tocsr()
+
+    # Start from each sentence's squared norm, which is already close to the leading direction
+    u = np.asarray(stacked.multiply(stacked).sum(axis=1)).ravel()
+    u = np.where(u > 0, u, 1.0)
+    u /= _block_norms(u, row_blocks, n_blocks)[row_blocks]
+
+    change = np.full(n_blocks, np.inf)
+    for _ in range(max_iter):
+        u_next = stacked @ (stacked_t @ u)
+        norms = _block_norms(u_next, row_blocks, n_blocks)
+        u_next /= np.where(norms > 0, norms, 1.0)[row_blocks]
+        change = np.bincount(row_blocks, weights=(u_next - u) ** 2, minlength=n_blocks)
+        u = u_next
+        if change.max() <= tol:
+            break
+
+    # Right singular vectors, normalized per case
+    v = stacked_t @ u
+    sigma = _block_norms(v, column_blocks, n_blocks)
+    v /= np.where(sigma > 0, sigma, 1.0)[column_blocks]
+
+    # Flip each case so that its largest absolute term weight is positive
+    signs = np.ones(n_blocks)
+    if len(v):
+        order = np.lexsort((-np.abs(v), column_blocks))
+        first = order[np.r_[True, column_blocks[order][1:] != column_blocks[order][:-1]]]
+        signs[column_blocks[first]] = np.sign(v[first])
+        signs[signs == 0] = 1.0
+    v *= signs[column_blocks]
+
+    projected = stacked @ v
+    bounds = np.cumsum([0] + [matrix.shape[0] for matrix in term_matrices])
+    svd_matrices = [projected[start:end, np.newaxis] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    for block in np.flatnonzero(change > tol).tolist():
+        # ARPACK needs a component count below both dimensions; a single row or column is rank one
+        # and converges in one iteration anyway
+        if min(term_matrices[block].shape) > 1:
+            from sklearn.decomposition import TruncatedSVD
+
+            svd_matrices[block] = TruncatedSVD(n_components=1, algorithm='arpack').fit_transform(term_matrices[block])
+    return svd_matrices
+
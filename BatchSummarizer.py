@@ -0,0 +1,632 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Optional
+
+from PartSegmentation import PartSegmentation
+from Preprocessing import Preprocessing
+from LSA import LSA
+from AtomicFile import write_text
+from BatchSVD import batched_leading_svd
+from CaseIndex import CaseIndex, document_vector, random_projection
+from CorpusPack import CorpusReader
+from CorpusVectorizer import load_vectorizer
+from Instrumentation import CaseMetrics, JsonlSink, PrometheusSink, activate, timed
+from SentenceStore import SentenceStore
+from HeadingsKeywords import heading_settings
+from SummaryCache import SummaryCache, file_digest, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+
+CASE_FILE_NAME = 'court case.txt'
+DEFAULT_OUTPUT_NAME = 'summit_summary.txt'
+
+DEFAULT_CONFIG = {
+    'output_name': DEFAULT_OUTPUT_NAME,
+    'lsa_options': {},
+    'vectorizer_path': None,
+    'units': 'sentences',
+    'cache_dir': DEFAULT_CACHE_DIR,
+    'cache_max_bytes': DEFAULT_CACHE_MAX_BYTES,
+    'force': False,
+    'metrics_jsonl': None,
+    'metrics_prom': None,
+    'svd_batch_size': 1,
+    'store_path': None,
+    'headings_path': None,
+    'corpus_path': None,
+    'index_path': None,
+}
+
+# Pipeline objects owned by the current process. They are created once per
+# worker on first use and reused for every case that worker handles.
+_segmenters = {}
+_preprocessor = None
+_vectorizers = {}
+_caches = {}
+_stores = {}
+_corpora = {}
+_indexes = {}
+
+
+def get_segmenter(headings_path: Optional[str] = None) -> PartSegmentation:
+    """
+    Return the PartSegmentation instance of the current process for a heading configuration
+    (headings.json by default), creating it on first use.
+    """
+    if headings_path not in _segmenters:
+        _segmenters[headings_path] = PartSegmentation(headings_path)
+    return _segmenters[headings_path]
+
+
+def get_preprocessor() -> Preprocessing:
+    """
+    Return the Preprocessing instance of the current process, creating it on first use.
+    """
+    global _preprocessor
+    if _preprocessor is None:
+        _preprocessor = Preprocessing()
+    return _preprocessor
+
+
+def get_vectorizer(vectorizer_path: str, units: Optional[str] = None):
+    """
+    Description:
+    Return the corpus vectorizer stored at the given path, loading it once per process.
+
+    Parameters:
+    - vectorizer_path: Path of a vectorizer saved by CorpusVectorizer.save_vectorizer.
+    - units: The units the vectorizer will be used with; it must have been fitted on the same units.
+
+    Return:
+    - vectorizer: The fitted TF-IDF vectorizer.
+    """
+    key = (vectorizer_path, units)
+    if key not in _vectorizers:
+        _vectorizers[key] = load_vectorizer(vectorizer_path, units)
+    return _vectorizers[key]
+
+
+def preload_pipeline(config: Dict):
+    """
+    Description:
+    Import the libraries the pipeline defers to first use (scikit-learn, the fuzzy matcher and, for
+    sentence units, NLTK with its resources). Called before starting a process pool so forked workers
+    inherit them, and before timing anything, so the import cost is paid once rather than by every
+    worker and by the first case. Importing main stays fast because nothing calls this at import time.
+
+    Parameters:
+    - config: The pipeline configuration (see make_config).
+    """
+    import scipy.sparse
+    import sklearn.decomposition
+    import sklearn.feature_extraction.text
+    import sklearn.preprocessing
+    from HeadingMatcher import _fuzzy_scorers
+
+    _fuzzy_scorers()
+    if config['units'] == 'sentences':
+        try:
+            # Loads the NLTK tokenizer and stop words
+            get_preprocessor().split_section(["Warm up."])
+        except LookupError as error:
+            # Reported again for every case, so the run still starts
+            print(f"Could not load NLTK resources: {error}", file=sys.stderr)
+
+
+def find_case_folders(input_root: str) -> List[str]:
+    """
+    Description:
+    List the case folders under the input root that contain a court case file.
+
+    Parameters:
+    - input_root: The folder holding one sub-folder per court case.
+
+    Return:
+    - case_folders: Sorted list of case folder paths.
+    """
+    case_folders = []
+    for folder_name in sorted(os.listdir(input_root)):
+        folder_path = os.path.join(input_root, folder_name)
+        if os.path.isfile(os.path.join(folder_path, CASE_FILE_NAME)):
+            case_folders.append(folder_path)
+    return case_folders
+
+
+def case_id(folder_path: str) -> str:
+    """
+    Identifier of a case: the name of its folder, e.g. 'G.R. No. 190640, January 12, 2011'.
+    """
+    return os.path.basename(os.path.normpath(folder_path))
+
+
+def make_config(**overrides) -> Dict:
+    """
+    Description:
+    Build a batch configuration from DEFAULT_CONFIG and the given overrides.
+
+    Parameters:
+    - overrides: Any of the DEFAULT_CONFIG keys:
+        - output_name: The file name of the summary written inside each case folder.
+        - lsa_options: Extra keyword arguments passed to LSA (section percentages, SVD and scoring settings).
+        - vectorizer_path: Optional corpus vectorizer to transform cases with instead of fitting one per case.
+        - units: 'sentences' to summarize NLTK sentences tokenized once by Preprocessing,
+                 or 'lines' to summarize raw lines tokenized by the vectorizer.
+        - cache_dir: Folder of the summary cache, or None to disable caching.
+        - cache_max_bytes: Size the summary cache is trimmed back to after a batch.
+        - force: Recompute every summary even when the cache has it.
+        - metrics_jsonl: Optional JSON Lines file receiving per-case stage durations and counters.
+        - metrics_prom: Optional Prometheus text file receiving the aggregated metrics of the batch.
+        - svd_batch_size: Number of cases per worker task whose SVDs are computed together by BatchSVD.
+                          1 fits a TruncatedSVD per case. Only used with the 'arpack' algorithm,
+                          whose results BatchSVD matches.
+        - store_path: Optional SQLite SentenceStore receiving every sentence's label, position and score.
+        - headings_path: Optional heading configuration to segment with instead of headings.json.
+        - corpus_path: Optional corpus pack (see CorpusPack.pack_corpus) to read case texts from;
+                       cases missing from it or changed since packing are read from their files.
+        - index_path: Optional CaseIndex receiving a document vector of every case, for related-decision
+                      lookup. Requires vectorizer_path so that all vectors share one term space.
+
+    Return:
+    - config: The complete configuration dictionary.
+    """
+    unknown = set(overrides) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown batch options: {sorted(unknown)}")
+    config = dict(DEFAULT_CONFIG)
+    config.update(overrides)
+    return config
+
+
+def get_cache(config: Dict) -> Optional[SummaryCache]:
+    """
+    Return the SummaryCache of the current process for the configuration, or None when caching is off.
+    """
+    cache_dir = config['cache_dir']
+    if not cache_dir:
+        return None
+    if cache_dir not in _caches:
+        _caches[cache_dir] = SummaryCache(cache_dir, config['cache_max_bytes'])
+    return _caches[cache_dir]
+
+
+def get_store(config: Dict) -> Optional[SentenceStore]:
+    """
+    Return the SentenceStore of the current process for the configuration, or None when it is off.
+    """
+    store_path = config['store_path']
+    if not store_path:
+        return None
+    if store_path not in _stores:
+        _stores[store_path] = SentenceStore(store_path)
+    return _stores[store_path]
+
+
+def get_corpus(config: Dict) -> Optional[CorpusReader]:
+    """
+    Return the memory-mapped corpus pack of the current process for the configuration, or None when it is off.
+    """
+    corpus_path = config['corpus_path']
+    if not corpus_path:
+        return None
+    if corpus_path not in _corpora:
+        _corpora[corpus_path] = CorpusReader(corpus_path)
+    return _corpora[corpus_path]
+
+
+def get_index(config: Dict) -> Optional[CaseIndex]:
+    """
+    Return the similarity index of the current process for the configuration, or None when it is off.
+    Only the process running the batch adds to it; workers use it to tell which cases are indexed.
+    """
+    index_path = config['index_path']
+    if not index_path:
+        return None
+    if index_path not in _indexes:
+        if not config['vectorizer_path']:
+            raise ValueError("The similarity index needs a corpus vectorizer (see fit-vectorizer) "
+                             "so that case vectors share one term space")
+        index = CaseIndex(index_path)
+        index.bind_vectorizer(file_digest(config['vectorizer_path']))
+        # Draw the projection once here; run_batch and CaseWatcher call this before starting their
+        # pool, so forked workers share it instead of each drawing a (vocabulary x dim) matrix
+        vocabulary_size = len(get_vectorizer(config['vectorizer_path'], config['units']).vocabulary_)
+        random_projection(vocabulary_size, index.dim, index.seed)
+        _indexes[index_path] = index
+    return _indexes[index_path]
+
+
+def add_to_index(index: Optional[CaseIndex], result: Dict):
+    """
+    Move the document vector a worker computed for a case from its result into the index.
+    """
+    vector = result.pop('vector', None)
+    if index is not None and vector is not None:
+        index.add(case_id(result['case']), vector, result.pop('index_key', None))
+
+
+def summary_settings(config: Dict) -> Dict:
+    """
+    Description:
+    Collect every setting besides the input text that changes a case's summary.
+
+    Parameters:
+    - config: The batch configuration.
+
+    Return:
+    - settings: JSON-serializable dictionary used in the summary cache key.
+    """
+    vectorizer_path = config['vectorizer_path']
+    return {
+        'lsa_options': config['lsa_options'],
+        'units': config['units'],
+        'vectorizer': file_digest(vectorizer_path) if vectorizer_path else None,
+        'headings': heading_settings(get_segmenter(config['headings_path']).heading_config),
+        'batched_svd': use_batched_svd(config),
+    }
+
+
+def build_lsa(sections: Dict[str, List[str]], config: Dict) -> LSA:
+    """
+    Description:
+    Preprocess segmented sections and set up LSA on them.
+
+    Parameters:
+    - sections: The segmented case, as returned by PartSegmentation.
+    - config: The batch configuration.
+
+    Return:
+    - lsa: The LSA summarizer for the case.
+    """
+    # Split into sentences and tokenize them once; LSA reuses the tokens
+    tokens = None
+    if config['units'] == 'sentences':
+        sections, tokens = get_preprocessor().split_sections(sections)
+
+    vectorizer_path = config['vectorizer_path']
+    vectorizer = get_vectorizer(vectorizer_path, config['units']) if vectorizer_path else None
+    return LSA(sections, vectorizer=vectorizer, tokens_dict=tokens, **config['lsa_options'])
+
+
+def summarize_text(text: str, config: Optional[Dict] = None) -> Dict:
+    """
+    Description:
+    Summarize the text of one decision and return the summary with the score of every selected sentence.
+
+    Parameters:
+    - text: The full text of the court case.
+    - config: The batch configuration (see make_config). Only the pipeline settings are used.
+
+    Return:
+    - summary: A dictionary with
+        - 'summary': The formatted summary text.
+        - 'sections': Dictionary mapping 'facts', 'issues' and 'rulings' to a list of
+                      {'position', 'sentence', 'score'} records in original order.
+    """
+    config = config or DEFAULT_CONFIG
+    lsa = build_lsa(get_segmenter(config['headings_path']).segment_by_headings(text), config)
+    result = lsa.summarize()
+    sentences = result['sentences']
+    scores = result['scores']
+    # Deduplicated results index the kept sentences only; report their original positions
+    positions = result['positions'] if result['positions'] is not None else range(len(sentences))
+    return {
+        'summary': lsa.format_summary(result),
+        'sections': {
+            label: [{'position': int(positions[i]), 'sentence': sentences[i], 'score': float(scores[i])}
+                    for i in indices]
+            for label, indices in result['selected'].items()
+        },
+    }
+
+
+def text_vector(text: str, config: Dict):
+    """
+    Description:
+    Compute the similarity index vector of a decision the index does not hold, e.g. a new case,
+    the same way the batch computes the vectors of indexed cases.
+
+    Parameters:
+    - text: The full text of the court case.
+    - config: The batch configuration, with index_path and vectorizer_path set.
+
+    Return:
+    - vector: The unit-norm float32 document vector (see CaseIndex.document_vector).
+    """
+    index = get_index(config)
+    lsa = build_lsa(get_segmenter(config['headings_path']).segment_by_headings(text), config)
+    _, _, term_matrix = lsa.build_matrix()
+    scores = lsa.score_sentences(lsa.apply_svd(term_matrix))
+    return document_vector(term_matrix, scores, index.dim, index.seed)
+
+
+def summarize_case(folder_path: str, config: Optional[Dict] = None) -> Dict:
+    """
+    Description:
+    Segment, preprocess and summarize a single case folder and write its summary file.
+    Cases whose text and settings match a cached summary are not recomputed.
+    Errors are caught and reported in the result so one bad case does not stop a batch.
+
+    Parameters:
+    - folder_path: The case folder containing the court case file.
+    - config: The batch configuration (see make_config). Defaults to DEFAULT_CONFIG.
+
+    Return:
+    - result: A dictionary with the case folder, 'ok' flag, output path or error, whether the
+              summary came from the cache, and elapsed seconds.
+    """
+    return summarize_cases([folder_path], config)[0]
+
+
+def summarize_cases(folder_paths: List[str], config: Optional[Dict] = None) -> List[Dict]:
+    """
+    Description:
+    Summarize a group of case folders like summarize_case. When the configuration asks for a batched
+    SVD (svd_batch_size > 1 with a single LSA component), the leading singular vectors of all
+    cases in the group are computed together in one pass by BatchSVD.
+
+    Parameters:
+    - folder_paths: The case folders containing the court case files.
+    - config: The batch configuration (see make_config). Defaults to DEFAULT_CONFIG.
+
+    Return:
+    - results: One result dictionary per case folder, as described in summarize_case.
+    """
+    config = config or DEFAULT_CONFIG
+    jobs = []
+    for folder_path in folder_paths:
+        job = {
+            'result': {'case': folder_path, 'ok': False, 'cached': False},
+            'metrics': CaseMetrics(folder_path) if metrics_enabled(config) else None,
+            'seconds': 0.0,
+        }
+        job['state'] = _run_step(job, _prepare_case, folder_path, config)
+        jobs.append(job)
+
+    pending = [job for job in jobs if job['state'] is not None]
+    if use_batched_svd(config) and len(pending) > 1:
+        start = time.perf_counter()
+        svd_matrices = batched_leading_svd([job['state']['term_matrix'] for job in pending])
+        share = (time.perf_counter() - start) / len(pending)
+        for job, svd_matrix in zip(pending, svd_matrices):
+            job['state']['svd_matrix'] = svd_matrix
+            job['seconds'] += share
+            if job['metrics'] is not None:
+                job['metrics'].durations['batched_svd'] = share
+
+    for job in pending:
+        _run_step(job, _finish_case, job['state'], config)
+
+    results = []
+    for job in jobs:
+        result = job['result']
+        result['ok'] = 'error' not in result
+        result['seconds'] = job['seconds']
+        if job['metrics'] is not None:
+            result['metrics'] = job['metrics'].as_dict()
+        results.append(result)
+    return results
+
+
+def use_batched_svd(config: Dict) -> bool:
+    """
+    Whether cases are grouped for BatchSVD. It only computes the leading component and matches
+    TruncatedSVD's ARPACK solver, so other solvers and seeds keep the per-case SVD.
+    """
+    options = config['lsa_options']
+    return (config['svd_batch_size'] > 1 and options.get('n_components', 1) == 1
+            and options.get('algorithm', 'randomized') == 'arpack')
+
+
+def _run_step(job: Dict, step, *args):
+    """
+    Run one step of a case with its metrics active, adding its time to the case and turning
+    errors into the case's error message. Returns the step's return value, or None on error.
+    """
+    start = time.perf_counter()
+    try:
+        with activate(job['metrics']):
+            return step(*args, job['result'])
+    except Exception as error:
+        job['result']['error'] = f"{type(error).__name__}: {error}"
+        return None
+    finally:
+        job['seconds'] += time.perf_counter() - start
+
+
+def _prepare_case(folder_path: str, config: Dict, result: Dict) -> Optional[Dict]:
+    """
+    First step of a case: serve it from the cache, or segment it and build its term matrix.
+    Returns the state needed by _finish_case, or None when the cached summary was used.
+    """
+    segmenter = get_segmenter(config['headings_path'])
+    case_file_path = os.path.join(folder_path, CASE_FILE_NAME)
+    summary_file_path = os.path.join(folder_path, config['output_name'])
+    result['output'] = summary_file_path
+    cache = get_cache(config)
+    key = None
+    corpus = get_corpus(config)
+    name = case_id(folder_path)
+    packed = corpus is not None and corpus.is_current(name, case_file_path)
+
+    if cache is None:
+        # Stream and segment the text
+        if packed:
+            sections = segmenter.segment_lines(corpus.lines(name))
+        else:
+            sections = segmenter.segment_file(case_file_path)
+    else:
+        with timed('read'):
+            if packed:
+                raw_text = corpus.text(name)
+            else:
+                with open(case_file_path, 'rb') as file:
+                    raw_text = file.read()
+        key = cache.make_key(raw_text, summary_settings(config))
+        summary = None if config['force'] else cache.get(key)
+        # A cached summary is only enough if the sentence store and index are off or already have this version
+        store = get_store(config)
+        index = get_index(config)
+        if (summary is not None and (store is None or store.content_key(name) == key)
+                and (index is None or index.content_key(name) == key)):
+            result['cached'] = True
+            with timed('write'):
+                if _read_text(summary_file_path) != summary:
+                    write_text(summary_file_path, summary)
+            return None
+        if packed:
+            sections = segmenter.segment_lines(corpus.lines(name))
+        else:
+            sections = segmenter.segment_by_headings(raw_text.decode('utf-8'))
+
+    lsa = build_lsa(sections, config)
+    sentences, labels, term_matrix = lsa.build_matrix()
+    return {
+        'lsa': lsa,
+        'sentences': sentences,
+        'labels': labels,
+        'term_matrix': term_matrix,
+        'case_id': name,
+        'summary_file_path': summary_file_path,
+        'cache_key': key,
+    }
+
+
+def _finish_case(state: Dict, config: Dict, result: Dict):
+    """
+    Second step of a case: apply the SVD unless a batched one was computed, select the
+    sentences, then write and cache the summary.
+    """
+    lsa = state['lsa']
+    svd_matrix = state.get('svd_matrix')
+    if svd_matrix is None:
+        svd_matrix = lsa.apply_svd(state['term_matrix'])
+    summary_result = lsa.summarize_svd(state['sentences'], state['labels'], svd_matrix)
+    summary = lsa.format_summary(summary_result)
+
+    store = get_store(config)
+    if store is not None:
+        with timed('store'):
+            store.save_case(state['case_id'], summary_result, state['cache_key'])
+
+    index = get_index(config)
+    if index is not None:
+        # The vector is added to the index by the process running the batch (see add_to_index)
+        with timed('index'):
+            result['vector'] = document_vector(state['term_matrix'], summary_result['scores'], index.dim, index.seed)
+        result['index_key'] = state['cache_key']
+
+    with timed('write'):
+        write_text(state['summary_file_path'], summary)
+    cache = get_cache(config)
+    if cache is not None:
+        cache.put(state['cache_key'], summary)
+
+
+def metrics_enabled(config: Dict) -> bool:
+    """
+    Whether the configuration asks for per-case metrics.
+    """
+    return bool(config.get('metrics_jsonl') or config.get('metrics_prom'))
+
+
+def open_metric_sinks(config: Dict) -> List:
+    """
+    Create the metric sinks requested by the configuration.
+    """
+    sinks = []
+    if config.get('metrics_jsonl'):
+        sinks.append(JsonlSink(config['metrics_jsonl']))
+    if config.get('metrics_prom'):
+        sinks.append(PrometheusSink(config['metrics_prom']))
+    return sinks
+
+
+def run_batch(input_root: str, workers: int = 1, config: Optional[Dict] = None) -> Dict:
+    """
+    Description:
+    Summarize every case folder under the input root, fanning cases out to a process pool.
+
+    Parameters:
+    - input_root: The folder holding one sub-folder per court case.
+    - workers: Number of worker processes. A value of 1 runs everything in the current process.
+    - config: The batch configuration shared by every case (see make_config).
+
+    Return:
+    - report: A dictionary with the per-case results, success/failure/cached counts, elapsed seconds
+              and throughput in cases per second.
+    """
+    config = config or DEFAULT_CONFIG
+    case_folders = find_case_folders(input_root)
+    sinks = open_metric_sinks(config)
+    results = []
+    # Imported up front so forked workers inherit the libraries and no case timing includes the imports
+    preload_pipeline(config)
+    start = time.perf_counter()
+
+    index = get_index(config)
+
+    def collect(result):
+        add_to_index(index, result)
+        results.append(result)
+        _report_case(result)
+        for sink in sinks:
+            sink.write(result)
+
+    # Cases are handed out in groups so that BatchSVD can process a group at once
+    group_size = config['svd_batch_size'] if use_batched_svd(config) else 1
+    groups = [case_folders[i:i + group_size] for i in range(0, len(case_folders), group_size)]
+
+    if workers <= 1:
+        for group in groups:
+            for result in summarize_cases(group, config):
+                collect(result)
+    else:
+        # Load the headings, corpus pack and index before starting the pool so forked workers inherit them
+        get_segmenter(config['headings_path'])
+        get_corpus(config)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(summarize_cases, group, config) for group in groups]
+            for future in as_completed(futures):
+                for result in future.result():
+                    collect(result)
+
+    for sink in sinks:
+        sink.close()
+    if index is not None:
+        index.save()
+
+    # Trim the cache once all workers are done writing to it
+    cache = get_cache(config)
+    if cache is not None:
+        cache.evict()
+
+    elapsed = time.perf_counter() - start
+    succeeded = sum(1 for result in results if result['ok'])
+    return {
+        'results': sorted(results, key=lambda result: result['case']),
+        'cases': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'cached': sum(1 for result in results if result['cached']),
+        'seconds': elapsed,
+        'cases_per_sec': len(results) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def _read_text(path: str) -> Optional[str]:
+    """
+    Return the contents of a text file, or None if it does not exist.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _report_case(result: Dict):
+    """
+    Print a failed case to stderr as soon as its result comes in.
+    """
+    if not result['ok']:
+        print(f"FAILED {result['case']}: {result['error']}", file=sys.stderr)
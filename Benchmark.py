@@ -0,0 +1,349 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import List, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from AtomicFile import atomic_open, write_text
+from LSA import LSA
+from BatchSummarizer import (get_segmenter, get_preprocessor, get_vectorizer, preload_pipeline,
+                             find_case_folders, make_config, CASE_FILE_NAME)
+
+HUMAN_SUMMARY_NAME = 'human summary.txt'
+DEFAULT_REPORT_PATH = 'benchmark_report.json'
+SECTIONS = ['facts', 'issues', 'rulings']
+STAGES = ['read', 'segment', 'preprocess', 'vectorize', 'svd', 'select', 'write']
+
+# Startup budget of 'import main', and the packages that must only be imported on first use
+DEFAULT_IMPORT_BUDGET_MS = 500.0
+DEFERRED_PACKAGES = ('sklearn', 'scipy', 'pandas', 'nltk', 'fuzzywuzzy', 'rapidfuzz', 'joblib')
+# e.g. 'import time:       831 |      20523 |           numpy.lib._index_tricks_impl'
+IMPORT_TIME_LINE = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+# Section headings used in both the generated and the human summaries
+SUMMARY_HEADING = re.compile(r'^\s*(facts|issues?|rulings?)\s*:\s*$', re.IGNORECASE)
+WORD = re.compile(r'\w+')
+
+
+def parse_summary(text: str) -> Dict[str, str]:
+    """
+    Description:
+    Split a summary into its FACTS, ISSUES and RULINGS parts. Accepts the singular forms
+    ('ISSUE:', 'RULING:') used by some human summaries.
+
+    Parameters:
+    - text: The summary text.
+
+    Return:
+    - parts: A dictionary mapping 'facts', 'issues' and 'rulings' to their text.
+    """
+    parts = {section: [] for section in SECTIONS}
+    current_section = None
+    for line in text.splitlines():
+        heading = SUMMARY_HEADING.match(line)
+        if heading:
+            current_section = heading.group(1).lower().rstrip('s') + 's'
+        elif current_section is not None:
+            parts[current_section].append(line)
+    return {section: "\n".join(lines).strip() for section, lines in parts.items()}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens used for ROUGE.
+    """
+    return WORD.findall(text.lower())
+
+
+def _f_score(overlap: int, candidate_total: int, reference_total: int) -> Dict[str, float]:
+    precision = overlap / candidate_total if candidate_total else 0.0
+    recall = overlap / reference_total if reference_total else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def rouge_n(candidate: List[str], reference: List[str], n: int) -> Dict[str, float]:
+    """
+    Description:
+    ROUGE-N with clipped n-gram counts.
+
+    Parameters:
+    - candidate: Tokens of the generated summary.
+    - reference: Tokens of the human summary.
+    - n: The n-gram size.
+
+    Return:
+    - scores: Dictionary with precision, recall and f1.
+    """
+    candidate_ngrams = Counter(zip(*[candidate[i:] for i in range(n)]))
+    reference_ngrams = Counter(zip(*[reference[i:] for i in range(n)]))
+    overlap = sum((candidate_ngrams & reference_ngrams).values())
+    return _f_score(overlap, sum(candidate_ngrams.values()), sum(reference_ngrams.values()))
+
+
+def lcs_length(first: List[str], second: List[str]) -> int:
+    """
+    Length of the longest common subsequence, using the bit-parallel algorithm of Hyyrö
+    so that long sections are compared in O(len(first) * len(second) / word size).
+    """
+    if not first or not second:
+        return 0
+    positions = {}
+    for i, token in enumerate(first):
+        positions[token] = positions.get(token, 0) | (1 << i)
+    mask = (1 << len(first)) - 1
+    row = mask
+    for token in second:
+        matches = row & positions.get(token, 0)
+        row = ((row + matches) | (row - matches)) & mask
+    return len(first) - bin(row).count('1')
+
+
+def rouge_l(candidate: List[str], reference: List[str]) -> Dict[str, float]:
+    """
+    Description:
+    ROUGE-L based on the longest common subsequence.
+
+    Parameters:
+    - candidate: Tokens of the generated summary.
+    - reference: Tokens of the human summary.
+
+    Return:
+    - scores: Dictionary with precision, recall and f1.
+    """
+    return _f_score(lcs_length(candidate, reference), len(candidate), len(reference))
+
+
+def rouge_scores(candidate_text: str, reference_text: str) -> Dict[str, Dict[str, float]]:
+    """
+    ROUGE-1, ROUGE-2 and ROUGE-L of a generated text against a human text.
+    """
+    candidate = tokenize(candidate_text)
+    reference = tokenize(reference_text)
+    return {
+        'rouge1': rouge_n(candidate, reference, 1),
+        'rouge2': rouge_n(candidate, reference, 2),
+        'rougeL': rouge_l(candidate, reference),
+    }
+
+
+def evaluate_summary(summary: str, human_summary: str) -> Dict[str, Dict]:
+    """
+    Description:
+    Compare a generated summary to the human summary, per section and over the whole text.
+
+    Parameters:
+    - summary: The generated summary.
+    - human_summary: The human summary.
+
+    Return:
+    - scores: Dictionary mapping 'facts', 'issues', 'rulings' and 'all' to their ROUGE scores.
+    """
+    generated_parts = parse_summary(summary)
+    human_parts = parse_summary(human_summary)
+    scores = {section: rouge_scores(generated_parts[section], human_parts[section]) for section in SECTIONS}
+    scores['all'] = rouge_scores(" ".join(generated_parts.values()), " ".join(human_parts.values()))
+    return scores
+
+
+def benchmark_case(folder_path: str, config: Dict) -> Dict:
+    """
+    Description:
+    Run the pipeline on one case stage by stage, timing each stage, and score the result
+    against the case's human summary when there is one.
+
+    Parameters:
+    - folder_path: The case folder containing the court case file.
+    - config: The batch configuration (see BatchSummarizer.make_config).
+
+    Return:
+    - result: Dictionary with the case folder, per-stage seconds, sentence count, deduplication report
+              (None when off) and ROUGE scores (None when the case has no human summary).
+    """
+    timings = {}
+    clock = time.perf_counter()
+
+    def lap(stage):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[stage] = now - clock
+        clock = now
+
+    with open(os.path.join(folder_path, CASE_FILE_NAME), 'r', encoding='utf-8') as file:
+        text = file.read()
+    lap('read')
+
+    sections = get_segmenter(config['headings_path']).segment_by_headings(text)
+    lap('segment')
+
+    tokens = None
+    if config['units'] == 'sentences':
+        sections, tokens = get_preprocessor().split_sections(sections)
+    lap('preprocess')
+
+    vectorizer = get_vectorizer(config['vectorizer_path'], config['units']) if config['vectorizer_path'] else None
+    lsa = LSA(sections, vectorizer=vectorizer, tokens_dict=tokens, **config['lsa_options'])
+    sentences, labels, term_matrix = lsa.build_matrix()
+    lap('vectorize')
+
+    svd_matrix = lsa.apply_svd(term_matrix)
+    lap('svd')
+
+    summary = lsa.format_summary(lsa.summarize_svd(sentences, labels, svd_matrix))
+    lap('select')
+
+    write_text(os.path.join(folder_path, config['output_name']), summary)
+    lap('write')
+
+    rouge = None
+    human_summary_path = os.path.join(folder_path, HUMAN_SUMMARY_NAME)
+    if os.path.isfile(human_summary_path):
+        with open(human_summary_path, 'r', encoding='utf-8') as file:
+            rouge = evaluate_summary(summary, file.read())
+
+    return {
+        'case': folder_path,
+        'sentences': len(sentences),
+        'dedupe': lsa.dedupe_report,
+        'timings': timings,
+        'rouge': rouge,
+    }
+
+
+def _peak_memory_mb() -> Optional[float]:
+    """
+    Peak resident memory of the current process in megabytes, or None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def run_benchmark(input_root: str, config: Optional[Dict] = None, report_file: Optional[str] = None) -> Dict:
+    """
+    Description:
+    Benchmark the pipeline over every case under the input root in the current process,
+    collecting quality (ROUGE against the human summaries) and performance figures.
+
+    Parameters:
+    - input_root: The folder holding one sub-folder per court case.
+    - config: The batch configuration (see BatchSummarizer.make_config). The cache is not used.
+    - report_file: Optional path of the JSON report to write.
+
+    Return:
+    - report: Dictionary with the per-case results, mean ROUGE f1 per section, total and mean
+              seconds per stage, the total term matrix shrink from deduplication (None when off),
+              cases per second and peak resident memory.
+    """
+    config = config or make_config()
+    results = []
+    failures = []
+    # Imported before timing so the first case's stages do not include the library imports
+    preload_pipeline(config)
+    start = time.perf_counter()
+    for folder_path in find_case_folders(input_root):
+        try:
+            results.append(benchmark_case(folder_path, config))
+        except Exception as error:
+            failures.append({'case': folder_path, 'error': f"{type(error).__name__}: {error}"})
+    elapsed = time.perf_counter() - start
+
+    scored = [result['rouge'] for result in results if result['rouge'] is not None]
+    rouge = {
+        section: {
+            metric: _mean([scores[section][metric]['f1'] for scores in scored])
+            for metric in ('rouge1', 'rouge2', 'rougeL')
+        }
+        for section in SECTIONS + ['all']
+    }
+    stage_totals = {stage: sum(result['timings'][stage] for result in results) for stage in STAGES}
+    dedupe = None
+    deduplicated = [result['dedupe'] for result in results if result['dedupe'] is not None]
+    if deduplicated:
+        dedupe = {key: sum(report[key] for report in deduplicated)
+                  for key in ('sentences', 'removed', 'rows_before', 'rows_after', 'nnz_before', 'nnz_after')}
+        dedupe['shrink'] = 1 - dedupe['nnz_after'] / dedupe['nnz_before'] if dedupe['nnz_before'] else 0.0
+
+    report = {
+        'config': {key: config[key] for key in ('lsa_options', 'units', 'vectorizer_path')},
+        'cases': len(results),
+        'failed': failures,
+        'scored_cases': len(scored),
+        'rouge_f1': rouge,
+        'stage_seconds': stage_totals,
+        'dedupe': dedupe,
+        'stage_mean_seconds': {stage: total / len(results) if results else 0.0
+                               for stage, total in stage_totals.items()},
+        'seconds': elapsed,
+        'cases_per_sec': len(results) / elapsed if elapsed > 0 else 0.0,
+        'peak_memory_mb': _peak_memory_mb(),
+        'results': results,
+    }
+
+    if report_file:
+        with atomic_open(report_file) as out_file:
+            json.dump(report, out_file, indent=2)
+    return report
+
+
+def measure_import_time(module: str = 'main', budget_ms: float = DEFAULT_IMPORT_BUDGET_MS,
+                        repeats: int = 3) -> Dict:
+    """
+    Description:
+    Measure the startup cost of importing a module with `python -X importtime` in fresh interpreters,
+    and check it against a budget and against the packages that should only load on first use.
+
+    Parameters:
+    - module: The module to import.
+    - budget_ms: The largest acceptable import time in milliseconds.
+    - repeats: Number of interpreters to run; the fastest run is reported, to discount a cold disk cache.
+
+    Return:
+    - report: Dictionary with the import time, the budget, the deferred packages that were imported
+              anyway, the slowest modules of the fastest run by self time, and 'ok'.
+    """
+    best = None
+    for _ in range(max(repeats, 1)):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+        modules = []
+        total_us = 0
+        for line in result.stderr.splitlines():
+            match = IMPORT_TIME_LINE.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us)))
+            # The module itself is the only top-level entry after the interpreter's own startup imports
+            if name == module and len(indent) == 1:
+                total_us = int(cumulative_us)
+        if best is None or total_us < best[0]:
+            best = (total_us, modules)
+
+    total_us, modules = best
+    loaded = {name.split('.')[0] for name, _ in modules}
+    deferred = [package for package in DEFERRED_PACKAGES if package in loaded]
+    milliseconds = total_us / 1000
+    return {
+        'module': module,
+        'ms': milliseconds,
+        'budget_ms': budget_ms,
+        'deferred_imported': deferred,
+        'slowest': [{'module': name, 'self_ms': self_us / 1000}
+                    for name, self_us in sorted(modules, key=lambda item: item[1], reverse=True)[:10]],
+        'ok': milliseconds <= budget_ms and not deferred,
+    }
@@ -0,0 +1,239 @@
+import json
+import os
+import re
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from AtomicFile import atomic_open
+from CorpusPack import parse_case_id
+
+DEFAULT_INDEX_PATH = 'case_index.json'
+INDEX_VERSION = 1
+DEFAULT_INDEX_DIM = 256
+DEFAULT_PROJECTION_SEED = 0
+
+# e.g. 'G.R. No. 190640' or 'GR No 190640' -> '190640'
+GR_PREFIX = re.compile(r'^\s*G\.?\s*R\.?\s*Nos?\.?\s*', re.IGNORECASE)
+
+# Random projections by (vocabulary size, dimension, seed), shared by every vector of the process
+_projections = {}
+
+
+def vectors_path(index_path: str) -> str:
+    """
+    Path of the float32 vector matrix stored next to an index's id table.
+    """
+    return os.path.splitext(index_path)[0] + '.f32'
+
+
+def random_projection(vocabulary_size: int, dim: int, seed: int) -> np.ndarray:
+    """
+    Gaussian random projection from the corpus vocabulary to dim dimensions; it approximately
+    preserves cosine similarity (Johnson-Lindenstrauss) and is rebuilt identically from its seed.
+    """
+    key = (vocabulary_size, dim, seed)
+    if key not in _projections:
+        rng = np.random.default_rng(seed)
+        _projections[key] = rng.standard_normal((vocabulary_size, dim), dtype=np.float32) / np.float32(np.sqrt(dim))
+    return _projections[key]
+
+
+def document_vector(term_matrix, scores: np.ndarray, dim: int = DEFAULT_INDEX_DIM,
+                    seed: int = DEFAULT_PROJECTION_SEED) -> np.ndarray:
+    """
+    Description:
+    Build the vector of a case from its TF-IDF term-sentence matrix and LSA sentence scores: the
+    score-weighted sum of the sentence rows, so the sentences LSA finds central dominate, randomly
+    projected to dim dimensions and L2-normalized. Vectors are only comparable across cases when
+    every term matrix comes from the same corpus vectorizer.
+
+    Parameters:
+    - term_matrix: The (sentences x terms) TF-IDF matrix of the case.
+    - scores: The LSA relevance score of every sentence. Negative scores count as zero.
+    - dim: The dimension of the vector.
+    - seed: Seed of the random projection.
+
+    Return:
+    - vector: float32 array of length dim with unit norm (all zeros for an empty case).
+    """
+    weights = np.maximum(np.asarray(scores, dtype=np.float64), 0.0)
+    if not weights.any():
+        weights = np.ones(len(weights))
+    centroid = np.asarray(term_matrix.T @ weights).ravel()
+    terms = np.flatnonzero(centroid)
+    vector = centroid[terms].astype(np.float32) @ random_projection(term_matrix.shape[1], dim, seed)[terms]
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class CaseIndex:
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH, dim: int = DEFAULT_INDEX_DIM,
+                 seed: int = DEFAULT_PROJECTION_SEED):
+        """
+        Description:
+        Persistent similarity index of case vectors (see document_vector): a float32 matrix with one
+        row per case, memory-mapped from '<name>.f32', and a JSON id table '<name>.json' mapping case
+        folder names and G.R. numbers to rows. Vectors added with add() are written by save().
+
+        Parameters:
+        - index_path: Path of the JSON id table.
+        - dim: Vector dimension of a new index. An existing index keeps its own.
+        - seed: Projection seed of a new index. An existing index keeps its own.
+        """
+        self.index_path = index_path
+        self.vectors_path = vectors_path(index_path)
+        header = {'version': INDEX_VERSION, 'dim': dim, 'seed': seed, 'vectorizer': None, 'cases': []}
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as file:
+                header = json.load(file)
+            if header.get('version') != INDEX_VERSION:
+                raise ValueError(f"{index_path}: unsupported similarity index version {header.get('version')!r}")
+        self.dim = header['dim']
+        self.seed = header['seed']
+        self.vectorizer = header['vectorizer']
+        self.cases = {case['case_id']: case for case in header['cases']}
+        self.by_gr_number = {number: case['case_id'] for case in header['cases'] for number in case['gr_numbers']}
+        self._row_ids = [case['case_id'] for case in sorted(header['cases'], key=lambda case: case['row'])]
+        self._saved_rows = len(self._row_ids)
+        self._pending = {}
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self._row_ids)
+
+    def __contains__(self, case_id: str) -> bool:
+        return case_id in self.cases
+
+    def bind_vectorizer(self, vectorizer_digest: str):
+        """
+        Check that vectors are built with the corpus vectorizer the index was built with.
+        An empty index adopts the given vectorizer.
+        """
+        if self.vectorizer != vectorizer_digest and self.cases:
+            raise ValueError(f"{self.index_path} was built with a different corpus vectorizer; "
+                             f"rebuild it or use another index path")
+        self.vectorizer = vectorizer_digest
+
+    def content_key(self, case_id: str) -> Optional[str]:
+        """
+        Return the content key stored with a case, or None if the case is not indexed.
+        """
+        case = self.cases.get(case_id)
+        return case['content_key'] if case else None
+
+    def add(self, case_id: str, vector: np.ndarray, content_key: Optional[str] = None):
+        """
+        Add or replace the vector of a case. Nothing is written until save().
+        """
+        if case_id not in self.cases:
+            self.cases[case_id] = {'case_id': case_id, **parse_case_id(case_id), 'row': len(self._row_ids)}
+            self._row_ids.append(case_id)
+            for number in self.cases[case_id]['gr_numbers']:
+                self.by_gr_number[number] = case_id
+        self.cases[case_id]['content_key'] = content_key
+        self._pending[case_id] = np.asarray(vector, dtype=np.float32)
+
+    def save(self):
+        """
+        Write the added vectors into the memory-mapped matrix, growing it as needed, then replace the
+        id table. Rows past the end of the id table are ignored, so a crash leaves the old index intact.
+        """
+        if not self._pending:
+            return
+        self._matrix = None
+        size = len(self._row_ids) * self.dim * 4
+        with open(self.vectors_path, 'ab') as file:
+            if file.tell() < size:
+                file.truncate(size)
+        matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(len(self._row_ids), self.dim))
+        for case_id, vector in self._pending.items():
+            matrix[self.cases[case_id]['row']] = vector
+        matrix.flush()
+        del matrix
+
+        header = {
+            'version': INDEX_VERSION,
+            'dim': self.dim,
+            'seed': self.seed,
+            'vectorizer': self.vectorizer,
+            'cases': [self.cases[case_id] for case_id in self._row_ids],
+        }
+        with atomic_open(self.index_path) as file:
+            json.dump(header, file)
+        self._saved_rows = len(self._row_ids)
+        self._pending.clear()
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        The saved (cases x dim) vector matrix, memory-mapped read-only.
+        """
+        if self._matrix is None:
+            if not self._saved_rows:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                     shape=(self._saved_rows, self.dim))
+        return self._matrix
+
+    def find(self, key: str) -> str:
+        """
+        Return the indexed case id for a case folder name or a G.R. number ('190640' or 'G.R. No. 190640').
+        """
+        if key in self.cases:
+            return key
+        number = GR_PREFIX.sub('', key).strip()
+        if number in self.by_gr_number:
+            return self.by_gr_number[number]
+        raise KeyError(f"Case '{key}' is not in the similarity index {self.index_path}")
+
+    def query_many(self, vectors: np.ndarray, k: int = 10,
+                   exclude: Optional[List[Optional[str]]] = None) -> List[List[Dict]]:
+        """
+        Description:
+        Find the k most similar indexed cases of several query vectors at once: one matrix product
+        gives every cosine similarity, np.argpartition picks each query's k best, and only those are sorted.
+
+        Parameters:
+        - vectors: (queries x dim) array of unit-norm query vectors.
+        - k: Number of cases to return per query.
+        - exclude: Optional case id per query to leave out of its results (e.g. the query case itself).
+
+        Return:
+        - results: Per query, up to k dictionaries with 'case_id', 'gr_numbers', 'date' and 'score'
+                   (cosine similarity), most similar first.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        scores = vectors @ self.matrix.T
+        for query, case_id in enumerate(exclude or []):
+            if case_id is not None and self.cases[case_id]['row'] < scores.shape[1]:
+                scores[query, self.cases[case_id]['row']] = -np.inf
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in range(len(vectors))]
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        results = []
+        for rows, row_scores in zip(np.take_along_axis(top, order, axis=1).tolist(),
+                                    np.take_along_axis(top_scores, order, axis=1).tolist()):
+            results.append([
+                {'case_id': self._row_ids[row], 'gr_numbers': self.cases[self._row_ids[row]]['gr_numbers'],
+                 'date': self.cases[self._row_ids[row]]['date'], 'score': score}
+                for row, score in zip(rows, row_scores) if score != -np.inf
+            ])
+        return results
+
+    def query(self, vector: np.ndarray, k: int = 10, exclude: Optional[str] = None) -> List[Dict]:
+        """
+        Find the k indexed cases most similar to a vector (see query_many).
+        """
+        return self.query_many(vector[None, :], k, [exclude] if exclude else None)[0]
+
+    def similar_to(self, key: str, k: int = 10) -> List[Dict]:
+        """
+        Find the k cases most similar to an indexed case, given by folder name or G.R. number.
+        """
+        case_id = self.find(key)
+        return self.query(np.array(self.matrix[self.cases[case_id]['row']]), k, exclude=case_id)
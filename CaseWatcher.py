@@ -0,0 +1,393 @@
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set
+
+from AtomicFile import atomic_open
+from BatchSummarizer import (summarize_cases, summary_settings, open_metric_sinks, get_segmenter, get_index,
+                             add_to_index, get_cache, preload_pipeline, make_config, case_id, CASE_FILE_NAME)
+from SummaryCache import code_version
+
+DEFAULT_CHECKPOINT_PATH = 'watch_checkpoint.json'
+CHECKPOINT_VERSION = 1
+# The summary cache is trimmed back to its size limit after this many newly summarized cases
+EVICT_EVERY_CASES = 100
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+ROOT_EVENTS = IN_CREATE | IN_MOVED_TO
+CASE_EVENTS = IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    def __init__(self, input_root: str):
+        """
+        Description:
+        Report case folders whose court case file is created, written or moved in, using Linux inotify
+        through ctypes. Raises OSError where inotify is not available.
+
+        Parameters:
+        - input_root: The folder holding one sub-folder per court case.
+        """
+        libc_name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available on this platform")
+        self._libc = libc
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.input_root = input_root
+        self._paths = {}
+        self._root_wd = self._add_watch(input_root, ROOT_EVENTS)
+        for folder_name in os.listdir(input_root):
+            folder_path = os.path.join(input_root, folder_name)
+            if os.path.isdir(folder_path):
+                self._add_watch(folder_path, CASE_EVENTS)
+
+    def _add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+        self._paths[wd] = path
+        return wd
+
+    def close(self):
+        os.close(self._fd)
+
+    def changes(self, timeout: float) -> Optional[Set[str]]:
+        """
+        Description:
+        Wait up to timeout seconds for changes.
+
+        Parameters:
+        - timeout: Seconds to wait.
+
+        Return:
+        - folders: The case folders that changed, or None when events were lost and every folder must be rescanned.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        folders = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b'\0')
+                offset += _EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & IN_IGNORED:
+                    self._paths.pop(wd, None)
+                    continue
+                path = self._paths.get(wd)
+                if path is None:
+                    continue
+                if wd == self._root_wd:
+                    if mask & IN_ISDIR:
+                        # A new case folder: watch it, and check it now in case the file was already inside
+                        folder_path = os.path.join(path, os.fsdecode(name))
+                        try:
+                            self._add_watch(folder_path, CASE_EVENTS)
+                        except OSError:
+                            continue
+                        folders.add(folder_path)
+                elif os.fsdecode(name) == CASE_FILE_NAME:
+                    folders.add(path)
+        return folders
+
+
+class PollingWatcher:
+    def __init__(self, input_root: str, interval: float = 5.0):
+        """
+        Description:
+        Report case folders whose court case file appeared or changed size or modification time,
+        by rescanning the input root at a fixed interval. Used where inotify is not available.
+
+        Parameters:
+        - input_root: The folder holding one sub-folder per court case.
+        - interval: Seconds between scans.
+        """
+        self.input_root = input_root
+        self.interval = interval
+        self._snapshot = scan_cases(input_root)
+        self._next_scan = time.monotonic() + interval
+
+    def close(self):
+        pass
+
+    def changes(self, timeout: float) -> Optional[Set[str]]:
+        """
+        Wait up to timeout seconds and return the case folders that changed since the previous scan.
+        """
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(wait, 0.0))
+        self._next_scan = time.monotonic() + self.interval
+        snapshot = scan_cases(self.input_root)
+        changed = {folder for folder, stat in snapshot.items() if self._snapshot.get(folder) != stat}
+        self._snapshot = snapshot
+        return changed
+
+
+def file_state(case_file: str) -> Optional[list]:
+    """
+    Size and modification time of a court case file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(case_file)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def scan_cases(input_root: str) -> Dict[str, list]:
+    """
+    Map every case folder under the input root that holds a court case file to that file's state.
+    """
+    states = {}
+    with os.scandir(input_root) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                state = file_state(os.path.join(entry.path, CASE_FILE_NAME))
+                if state is not None:
+                    states[entry.path] = state
+    return states
+
+
+def _ignore_interrupts():
+    # Ctrl+C reaches the whole process group; only the watcher process handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class CaseWatcher:
+    def __init__(self, input_root: str, config: Optional[Dict] = None, workers: int = 1,
+                 checkpoint_path: str = DEFAULT_CHECKPOINT_PATH, debounce: float = 2.0,
+                 poll_interval: float = 5.0, use_inotify: bool = True):
+        """
+        Description:
+        Keep the summaries of a case folder up to date as new or modified court case files land in it.
+        Changes are detected with inotify (or by polling where it is not available) and debounced:
+        a case is only summarized once its file has not changed for `debounce` seconds, so partially
+        written files are not picked up. Cases are summarized in a bounded process pool and recorded
+        in a checkpoint so that a restart only processes what changed while it was down.
+
+        Parameters:
+        - input_root: The folder holding one sub-folder per court case.
+        - config: The batch configuration (see BatchSummarizer.make_config).
+        - workers: Number of worker processes.
+        - checkpoint_path: JSON file recording the file state of every summarized case.
+        - debounce: Seconds a court case file must stay unchanged before it is summarized.
+        - poll_interval: Seconds between scans when polling.
+        - use_inotify: Use inotify when available; False always polls.
+        """
+        self.input_root = input_root
+        self.config = config or make_config()
+        self.workers = max(1, workers)
+        self.max_pending = 2 * self.workers
+        self.checkpoint_path = checkpoint_path
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        # The checkpoint only counts for the settings and code it was written with
+        settings = json.dumps(summary_settings(self.config), sort_keys=True, default=list)
+        self.settings_digest = hashlib.sha256((code_version() + settings).encode('utf-8')).hexdigest()
+        self.checkpoint = self.load_checkpoint()
+
+        # Folder -> {'since': time of the last change, 'state': file state then}
+        self.pending = {}
+        self.ready = []
+        self.running = {}
+        self.summarized = 0
+        self.failed = 0
+        self.written_since_eviction = 0
+
+    def load_checkpoint(self) -> Dict[str, list]:
+        """
+        Read the checkpoint, ignoring it when it was written for other settings or code.
+        """
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != CHECKPOINT_VERSION or data.get('settings') != self.settings_digest:
+            return {}
+        return data.get('cases', {})
+
+    def save_checkpoint(self):
+        """
+        Write the checkpoint atomically.
+        """
+        with atomic_open(self.checkpoint_path) as file:
+            json.dump({'version': CHECKPOINT_VERSION, 'settings': self.settings_digest,
+                       'cases': self.checkpoint}, file, indent=1, sort_keys=True)
+
+    def mark_changed(self, folder_path: str):
+        """
+        Restart the debounce timer of a case folder.
+        """
+        self.pending[folder_path] = {
+            'since': time.monotonic(),
+            'state': file_state(os.path.join(folder_path, CASE_FILE_NAME)),
+        }
+
+    def collect_ready(self):
+        """
+        Move debounced case folders whose file is unchanged and not yet checkpointed to the ready queue.
+        """
+        now = time.monotonic()
+        for folder_path, entry in list(self.pending.items()):
+            if now - entry['since'] < self.debounce or folder_path in self.running:
+                continue
+            state = file_state(os.path.join(folder_path, CASE_FILE_NAME))
+            if state != entry['state']:
+                # Still being written
+                self.mark_changed(folder_path)
+                continue
+            del self.pending[folder_path]
+            if state is not None and self.checkpoint.get(case_id(folder_path)) != state \
+                    and folder_path not in self.ready:
+                self.ready.append(folder_path)
+
+    def submit_ready(self, executor: ProcessPoolExecutor):
+        """
+        Hand ready case folders to the pool while fewer than max_pending are running.
+        """
+        while self.ready and len(self.running) < self.max_pending:
+            folder_path = self.ready.pop(0)
+            state = file_state(os.path.join(folder_path, CASE_FILE_NAME))
+            future = executor.submit(summarize_cases, [folder_path], self.config)
+            self.running[folder_path] = (future, state)
+
+    def collect_results(self, sinks) -> bool:
+        """
+        Record finished cases in the checkpoint, and their vectors in the similarity index when it is on.
+        Returns whether the checkpoint changed.
+        """
+        index = get_index(self.config)
+        changed = False
+        for folder_path, (future, state) in list(self.running.items()):
+            if not future.done():
+                continue
+            del self.running[folder_path]
+            try:
+                results = future.result()
+            except Exception as error:
+                results = [{'case': folder_path, 'ok': False, 'cached': False, 'seconds': 0.0,
+                            'error': f"{type(error).__name__}: {error}"}]
+            for result in results:
+                add_to_index(index, result)
+                for sink in sinks:
+                    sink.write(result)
+                if result['ok']:
+                    self.summarized += 1
+                    if not result['cached']:
+                        self.written_since_eviction += 1
+                    self.checkpoint[case_id(folder_path)] = state
+                    changed = True
+                    print(f"Summarized {folder_path}{' (from cache)' if result['cached'] else ''}")
+                else:
+                    self.failed += 1
+                    print(f"FAILED {folder_path}: {result['error']}", file=sys.stderr)
+        # The index is saved before the checkpoint so that checkpointed cases are always indexed
+        if changed and index is not None:
+            index.save()
+        return changed
+
+    def trim_cache(self):
+        """
+        Trim the summary cache back to its size limit (see SummaryCache.evict), when caching is on.
+        """
+        cache = get_cache(self.config)
+        if cache is not None:
+            cache.evict()
+        self.written_since_eviction = 0
+
+    def run(self, max_seconds: Optional[float] = None):
+        """
+        Description:
+        Summarize every case missing from the checkpoint, then watch for new and modified cases
+        until interrupted with Ctrl+C (or until max_seconds have passed).
+
+        Parameters:
+        - max_seconds: Optional time limit, mostly for testing.
+        """
+        watcher = None
+        if self.use_inotify:
+            try:
+                watcher = InotifyWatcher(self.input_root)
+            except OSError as error:
+                print(f"inotify unavailable ({error}), polling every {self.poll_interval}s", file=sys.stderr)
+        if watcher is None:
+            watcher = PollingWatcher(self.input_root, self.poll_interval)
+
+        # Cases that changed while the watcher was down; they count as already settled
+        for folder_path in scan_cases(self.input_root):
+            self.pending[folder_path] = {'since': float('-inf'),
+                                         'state': file_state(os.path.join(folder_path, CASE_FILE_NAME))}
+
+        # Load the libraries, headings and index before starting the pool so forked workers inherit them
+        preload_pipeline(self.config)
+        get_segmenter(self.config['headings_path'])
+        get_index(self.config)
+        sinks = open_metric_sinks(self.config)
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        print(f"Watching {self.input_root} with {type(watcher).__name__} and {self.workers} workers")
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_interrupts) as executor:
+                while deadline is None or time.monotonic() < deadline:
+                    self.collect_ready()
+                    self.submit_ready(executor)
+                    changes = watcher.changes(timeout=0.2 if self.running or self.pending else 1.0)
+                    if changes is None:
+                        # Events were lost: fall back to comparing every case with the checkpoint
+                        changes = set(scan_cases(self.input_root))
+                    for folder_path in changes:
+                        self.mark_changed(folder_path)
+                    if self.collect_results(sinks):
+                        self.save_checkpoint()
+                        if self.written_since_eviction >= EVICT_EVERY_CASES:
+                            self.trim_cache()
+                # Let running cases finish before stopping
+                for future, _ in list(self.running.values()):
+                    future.exception()
+                if self.collect_results(sinks):
+                    self.save_checkpoint()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+            for sink in sinks:
+                sink.close()
+            self.trim_cache()
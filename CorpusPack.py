@@ -0,0 +1,203 @@
+import json
+import mmap
+import os
+import re
+import struct
+from datetime import datetime
+from typing import List, Dict, Iterator
+
+import numpy as np
+
+from AtomicFile import atomic_open
+
+DEFAULT_PACK_PATH = 'corpus.pack'
+PACK_MAGIC = b'CASEPACK'
+PACK_VERSION = 1
+
+# Trailer: header offset, header length, magic
+_TRAILER = struct.Struct('<QQ8s')
+
+# e.g. 'G.R. No. 190640, January 12, 2011' or 'G.R. Nos. 123456 & 123457, May 2, 2019'
+CASE_FOLDER_NAME = re.compile(r'^G\.R\.\s*Nos?\.\s*(?P<numbers>.+?),\s*(?P<date>[A-Za-z]+\s+\d{1,2},\s*\d{4})\s*$')
+
+
+def parse_case_id(case_id: str) -> Dict:
+    """
+    Description:
+    Parse the G.R. number(s) and promulgation date from a case folder name.
+
+    Parameters:
+    - case_id: The folder name, e.g. 'G.R. No. 190640, January 12, 2011'.
+
+    Return:
+    - metadata: Dictionary with 'gr_numbers' (list of strings) and 'date' (ISO format),
+                both empty/None when the name does not follow the pattern.
+    """
+    match = CASE_FOLDER_NAME.match(case_id)
+    if not match:
+        return {'gr_numbers': [], 'date': None}
+    numbers = [number for number in re.split(r'\s*(?:&|,|and)\s*', match.group('numbers')) if number]
+    try:
+        date = datetime.strptime(re.sub(r'\s+', ' ', match.group('date')), '%B %d, %Y').date().isoformat()
+    except ValueError:
+        date = None
+    return {'gr_numbers': numbers, 'date': date}
+
+
+def _line_spans(raw_text: bytes) -> List[List[int]]:
+    """
+    Byte ranges of the stripped, non-empty lines of a text, split the way str.splitlines does.
+    """
+    spans = []
+    position = 0
+    for line in raw_text.decode('utf-8').splitlines(keepends=True):
+        size = len(line.encode('utf-8'))
+        stripped = line.strip()
+        if stripped:
+            start = position + len(line[:len(line) - len(line.lstrip())].encode('utf-8'))
+            spans.append([start, start + len(stripped.encode('utf-8'))])
+        position += size
+    return spans
+
+
+def pack_corpus(case_files: List[str], pack_path: str = DEFAULT_PACK_PATH) -> Dict:
+    """
+    Description:
+    Write every case text into one file that CorpusReader memory-maps: the raw texts back to back,
+    an index of the byte range of every stripped non-empty line, and a JSON header with each case's
+    metadata. The file is written to a temporary path and renamed into place.
+
+    Parameters:
+    - case_files: Paths of the court case files. Each case is identified by its folder name.
+    - pack_path: Path of the pack file to write.
+
+    Return:
+    - summary: Dictionary with the number of cases and lines and the pack size in bytes.
+    """
+    cases = []
+    line_spans = []
+    with atomic_open(pack_path, 'wb') as out_file:
+        out_file.write(PACK_MAGIC)
+        for case_file in case_files:
+            with open(case_file, 'rb') as file:
+                raw_text = file.read()
+            stat = os.stat(case_file)
+            case_id = os.path.basename(os.path.dirname(os.path.abspath(case_file)))
+            text_start = out_file.tell()
+            out_file.write(raw_text)
+            spans = [[text_start + start, text_start + end] for start, end in _line_spans(raw_text)]
+            cases.append({
+                'case_id': case_id,
+                **parse_case_id(case_id),
+                'source': os.path.abspath(case_file),
+                'source_size': stat.st_size,
+                'source_mtime_ns': stat.st_mtime_ns,
+                'text': [text_start, text_start + len(raw_text)],
+                'lines': [len(line_spans), len(line_spans) + len(spans)],
+            })
+            line_spans.extend(spans)
+
+        # Align the line index for zero-copy NumPy views
+        out_file.write(b'\0' * (-out_file.tell() % 8))
+        index_offset = out_file.tell()
+        out_file.write(np.asarray(line_spans, dtype='<i8').reshape(-1, 2).tobytes())
+
+        header = json.dumps({
+            'version': PACK_VERSION,
+            'index': [index_offset, len(line_spans)],
+            'cases': cases,
+        }).encode('utf-8')
+        header_offset = out_file.tell()
+        out_file.write(header)
+        out_file.write(_TRAILER.pack(header_offset, len(header), PACK_MAGIC))
+        size = out_file.tell()
+    return {'cases': len(cases), 'lines': len(line_spans), 'bytes': size}
+
+
+class CorpusReader:
+    def __init__(self, pack_path: str = DEFAULT_PACK_PATH):
+        """
+        Description:
+        Read-only, memory-mapped view of a corpus pack written by pack_corpus. Case texts and lines
+        are returned as memoryviews into the mapping, so nothing is copied until a line is decoded,
+        and worker processes that map the same pack share its pages.
+
+        Parameters:
+        - pack_path: Path of the pack file.
+        """
+        self.pack_path = pack_path
+        with open(pack_path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        header_offset, header_length, magic = _TRAILER.unpack_from(self._mmap, len(self._mmap) - _TRAILER.size)
+        if magic != PACK_MAGIC or self._mmap[:len(PACK_MAGIC)] != PACK_MAGIC:
+            raise ValueError(f"{pack_path} is not a corpus pack")
+        header = json.loads(bytes(self._view[header_offset:header_offset + header_length]))
+        if header['version'] != PACK_VERSION:
+            raise ValueError(f"{pack_path}: unsupported corpus pack version {header['version']}")
+
+        index_offset, line_count = header['index']
+        self.line_index = np.frombuffer(self._mmap, dtype='<i8', count=2 * line_count,
+                                        offset=index_offset).reshape(-1, 2)
+        self.cases = {case['case_id']: case for case in header['cases']}
+
+    def close(self):
+        self.line_index = None
+        self._view.release()
+        self._mmap.close()
+
+    def __len__(self) -> int:
+        return len(self.cases)
+
+    def __contains__(self, case_id: str) -> bool:
+        return case_id in self.cases
+
+    def case_ids(self) -> List[str]:
+        """
+        Return the identifiers of the packed cases in packing order.
+        """
+        return list(self.cases)
+
+    def metadata(self, case_id: str) -> Dict:
+        """
+        Return the metadata of a case: G.R. numbers, date, source file and its size and mtime when packed.
+        """
+        case = self.cases[case_id]
+        return {key: case[key] for key in ('case_id', 'gr_numbers', 'date', 'source', 'source_size',
+                                           'source_mtime_ns')}
+
+    def is_current(self, case_id: str, case_file: str) -> bool:
+        """
+        Whether a case is packed and its source file has not changed since (same size and mtime).
+        """
+        case = self.cases.get(case_id)
+        if case is None:
+            return False
+        try:
+            stat = os.stat(case_file)
+        except OSError:
+            return False
+        return stat.st_size == case['source_size'] and stat.st_mtime_ns == case['source_mtime_ns']
+
+    def text(self, case_id: str) -> memoryview:
+        """
+        Return the raw UTF-8 bytes of a case as a zero-copy view.
+        """
+        start, end = self.cases[case_id]['text']
+        return self._view[start:end]
+
+    def line_views(self, case_id: str) -> Iterator[memoryview]:
+        """
+        Yield zero-copy views of the stripped, non-empty lines of a case.
+        """
+        first, last = self.cases[case_id]['lines']
+        for start, end in self.line_index[first:last].tolist():
+            yield self._view[start:end]
+
+    def lines(self, case_id: str) -> Iterator[str]:
+        """
+        Yield the stripped, non-empty lines of a case, decoding each one only when it is reached.
+        Suitable for PartSegmentation.segment_lines.
+        """
+        for view in self.line_views(case_id):
+            yield str(view, 'utf-8')
@@ -0,0 +1,116 @@
+from typing import Iterable, Iterator, List, Optional, TYPE_CHECKING
+
+from LSA import tokens_analyzer
+
+# scikit-learn and joblib are imported by the functions that need them, so importing this module stays cheap
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+DEFAULT_VECTORIZER_PATH = 'tfidf_vectorizer.joblib'
+# The units a vectorizer is fitted on decide its analyzer: LSA looks 'sentences' tokens up in the
+# vocabulary directly, and transforms 'lines' with the vectorizer's own string analyzer
+VECTORIZER_UNITS = ('sentences', 'lines')
+
+
+def iter_corpus_lines(case_files: Iterable[str]) -> Iterator[str]:
+    """
+    Description:
+    Stream every non-empty line of the given court case files.
+    Each line is one document, the same unit LSA vectorizes per case.
+
+    Parameters:
+    - case_files: Paths of the court case text files.
+
+    Return:
+    - lines: An iterator over stripped, non-empty lines.
+    """
+    for case_file in case_files:
+        with open(case_file, 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def iter_corpus_tokens(case_files: Iterable[str], segmenter, preprocessor) -> Iterator[List[str]]:
+    """
+    Description:
+    Stream the token list of every sentence of the given court case files, segmented and tokenized
+    exactly as the pipeline does with units='sentences'.
+
+    Parameters:
+    - case_files: Paths of the court case text files.
+    - segmenter: The PartSegmentation to segment the cases with.
+    - preprocessor: The Preprocessing instance to split and tokenize the sections with.
+
+    Return:
+    - tokens: An iterator over token lists, one per sentence.
+    """
+    for case_file in case_files:
+        _, token_sections = preprocessor.split_sections(segmenter.segment_file(case_file))
+        for token_lists in token_sections.values():
+            yield from token_lists
+
+
+def fit_corpus_vectorizer(case_files: Iterable[str], units: str = 'lines', segmenter=None,
+                          preprocessor=None) -> 'TfidfVectorizer':
+    """
+    Description:
+    Fit one TF-IDF vectorizer over the whole corpus so that IDF weights reflect all decisions
+    instead of the units of a single case. The vocabulary is built from the same units LSA will
+    vectorize, so no term of a case is missing from it.
+
+    Parameters:
+    - case_files: Paths of the court case text files.
+    - units: 'lines' to fit on raw lines with the vectorizer's string analyzer, or 'sentences' to fit
+             on Preprocessing's sentence tokens with LSA.tokens_analyzer.
+    - segmenter: The PartSegmentation to use with units='sentences'.
+    - preprocessor: The Preprocessing instance to use with units='sentences'.
+
+    Return:
+    - vectorizer: The fitted TF-IDF vectorizer.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    if units not in VECTORIZER_UNITS:
+        raise ValueError(f"Unknown units '{units}', expected one of {VECTORIZER_UNITS}")
+    if units == 'sentences':
+        vectorizer = TfidfVectorizer(analyzer=tokens_analyzer)
+        vectorizer.fit(iter_corpus_tokens(case_files, segmenter, preprocessor))
+    else:
+        vectorizer = TfidfVectorizer(stop_words='english')
+        vectorizer.fit(iter_corpus_lines(case_files))
+    return vectorizer
+
+
+def save_vectorizer(vectorizer: 'TfidfVectorizer', units: str, output_file: str = DEFAULT_VECTORIZER_PATH):
+    """
+    Save a fitted vectorizer and the units it was fitted on to a compressed joblib file.
+    """
+    import joblib
+
+    joblib.dump({'units': units, 'vectorizer': vectorizer}, output_file, compress=3)
+
+
+def load_vectorizer(input_file: str = DEFAULT_VECTORIZER_PATH, units: Optional[str] = None) -> 'TfidfVectorizer':
+    """
+    Description:
+    Load a vectorizer saved by save_vectorizer. Files holding a bare vectorizer predate the units
+    record and were fitted on lines.
+
+    Parameters:
+    - input_file: Path of the saved vectorizer.
+    - units: Optional units the vectorizer will be used with; a vectorizer fitted on other units is rejected.
+
+    Return:
+    - vectorizer: The fitted TF-IDF vectorizer.
+    """
+    import joblib
+
+    saved = joblib.load(input_file)
+    if not isinstance(saved, dict):
+        saved = {'units': 'lines', 'vectorizer': saved}
+    if units is not None and saved['units'] != units:
+        raise ValueError(f"{input_file} was fitted on {saved['units']}, not {units}; "
+                         f"refit it with fit-vectorizer --units {units}")
+    return saved['vectorizer']
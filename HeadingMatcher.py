@@ -0,0 +1,124 @@
+import logging
+from types import MappingProxyType
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# (fuzz, process) of rapidfuzz, or (fuzzywuzzy's fuzz, None); imported on the first fuzzy comparison
+_scorers = None
+
+
+def _fuzzy_scorers():
+    global _scorers
+    if _scorers is None:
+        try:
+            from rapidfuzz import fuzz, process
+            _scorers = (fuzz, process)
+        except ImportError:
+            from fuzzywuzzy import fuzz
+            _scorers = (fuzz, None)
+    return _scorers
+
+
+def _max_ratio(line_length: int, heading_length: int) -> int:
+    """
+    Upper bound of fuzz.ratio for two strings of the given lengths.
+    The ratio is 2*M/T where M (matched characters) can never exceed the shorter string.
+    """
+    return int(round(100 * 2 * min(line_length, heading_length) / (line_length + heading_length)))
+
+
+class HeadingMatcher:
+    def __init__(self, heading_groups: Dict[str, List[str]], threshold: int = 75):
+        """
+        Description:
+        Precompile heading lists into a lookup that matches a line against all of them at once.
+        Headings are lowercased once, indexed by exact text for a fast path, and bucketed by the
+        line lengths that could still reach the threshold so that long lines are rejected without scoring.
+
+        Parameters:
+        - heading_groups: An ordered dictionary where the key is the section name and the value
+                          is the list of headings for that section. Earlier sections win ties.
+        - threshold: The minimum fuzz.ratio score (above 0, at most 100) for a line to count as a heading.
+        """
+        if not 0 < threshold <= 100:
+            raise ValueError(f"Heading threshold must be above 0 and at most 100, got {threshold!r}")
+        self.threshold = threshold
+        self.sections = tuple(heading_groups)
+        self.heading_groups = MappingProxyType({
+            section: tuple(heading.lower() for heading in headings)
+            for section, headings in heading_groups.items()
+        })
+
+        # Exact lowercased heading -> first section it belongs to
+        self._exact = {}
+        for section in self.sections:
+            for heading in self.heading_groups[section]:
+                self._exact.setdefault(heading, section)
+
+        # Longest line that could still score above the threshold against some heading
+        heading_lengths = [len(heading) for headings in self.heading_groups.values() for heading in headings]
+        self.max_line_length = 0
+        if heading_lengths:
+            longest = max(heading_lengths)
+            length = longest
+            while _max_ratio(length + 1, longest) >= threshold:
+                length += 1
+            self.max_line_length = length
+
+        # Line length -> ((section, candidate headings), ...) in section order
+        buckets = [[] for _ in range(self.max_line_length + 1)]
+        for line_length in range(1, self.max_line_length + 1):
+            for section in self.sections:
+                candidates = tuple(
+                    heading for heading in self.heading_groups[section]
+                    if _max_ratio(line_length, len(heading)) >= threshold
+                )
+                if candidates:
+                    buckets[line_length].append((section, candidates))
+        self._buckets = tuple(tuple(bucket) for bucket in buckets)
+
+    def _best_match(self, line_lower: str, candidates) -> Optional[str]:
+        """
+        Return the first candidate heading whose score reaches the threshold, if any.
+        """
+        fuzz, process = _fuzzy_scorers()
+        if process is not None:
+            # Batched scoring; the cutoff is widened by half a point to keep fuzzywuzzy's rounding
+            match = process.extractOne(line_lower, candidates, scorer=fuzz.ratio,
+                                       processor=None, score_cutoff=self.threshold - 0.5)
+            if match is not None and int(round(match[1])) >= self.threshold:
+                return match[0]
+            return None
+        for heading in candidates:
+            if fuzz.ratio(line_lower, heading) >= self.threshold:
+                return heading
+        return None
+
+    def match(self, line: str) -> Optional[str]:
+        """
+        Description:
+        Find the section whose headings the line is similar to.
+
+        Parameters:
+        - line: A single stripped line of text.
+
+        Return:
+        - section: The name of the first matching section, or None if the line is not a heading.
+        """
+        line_lower = line.lower()
+        if not line_lower or len(line_lower) > self.max_line_length:
+            return None
+
+        # An exact hit scores 100, so only sections listed before it still need fuzzy scoring
+        exact_section = self._exact.get(line_lower)
+
+        for section, candidates in self._buckets[len(line_lower)]:
+            if section == exact_section:
+                logger.debug("Matched heading: '%s' to '%s'", line, line_lower)
+                return section
+            heading = self._best_match(line_lower, candidates)
+            if heading is not None:
+                logger.debug("Matched heading: '%s' to '%s'", line, heading)
+                return section
+        return None
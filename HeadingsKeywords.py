@@ -1,98 +1,74 @@
-title_headings = ["decision", "en banc", "resolution"]
+import json
+import os
+from types import MappingProxyType
+from typing import Mapping, Optional
 
-facts_headings = [
-    'facts',
-    'antecedents',
-    'the antecedents',
-    'the factual antecedents',
-    'evidence for the prosecution',
-    'evidence for the defense',
-    'ruling of the rtc',
-    'ruling of the ca',
-    'the ruling of the ca',
-    'the charges',
-    'the defense\'s version',
-    'defense\'s version',
-    'the prosecution\'s version',
-    'proceedings before the court of appeals',
-    'the facts',
-    'version of the prosecution',
-    'version of the defense',
-    'the facts and the case'
-]
-issues_headings = [
-    'the issue',
-    'the issues'
-    'the issues presented',
-    'the issue before the court',
-    'the issues before the court',
-    'issue',
-    'issues',
-    'the present',
-    'petition',
-    'presented',
-]
-issue_kw = [
-    'issue',
-    'lone issue',
-    'whether or not',
-    'raise',
-    'raising',
-    'guilt',
-    'convict',
-    'err',
-    'committed error',
-    'reasonable doubt',
-    'issue',
-    'lone issue',
-    'whether or not',
-    'raise',
-    'raising',
-    'guilt'
-]
+# Section headings and keywords live in headings.json; edit that file (and bump its version when
+# the format changes) instead of this module.
+HEADINGS_CONFIG_VERSION = 1
+DEFAULT_HEADINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'headings.json')
+HEADING_SECTIONS = ('title', 'facts', 'issues', 'rulings')
 
-ruling_headings = [
-    'our ruling',
-    'the ruling of the court',
-    'the rulings of the court',
-    'the ruling of this court',
-    'proper penalty',
-    'the court\'s ruling',
-]
-rulings_kw = [
-    'declare',
-    'grant',
-    'denied',
-    'dismiss',
-    'affirm',
-    'guilty',
-    'not guilty',
-    'reverse',
-    'sets aside',
-    'set aside',
-    'acquitted',
-    'acquittal',
-    'reinstated',
-    'modification',
-    'the decision of the court',
-    'ruling',
-    'ruled',
-    'rendered',
-    'decision',
-    'dispositive',
-    'merit',
-    'meritorious',
-    'sentenced',
-    'penalty',
-    'exemplary damages',
-    'life imprisonment',
-    'reclusion perpetua',
-    'guilty beyond reasonable doubt',
-    'remanded',
-    'recalled',
-    'redirected',
-    'accordingly'
-]
+# Loaded configurations by absolute path, shared by every PartSegmentation of the process
+_configs = {}
 
 
+def load_heading_config(path: Optional[str] = None) -> Mapping:
+    """
+    Description:
+    Load a heading configuration once per process. The result is read-only: heading and keyword
+    lists are tuples inside read-only mappings, so it can be shared by every instance and inherited
+    by forked workers.
 
+    Parameters:
+    - path: Path of the JSON configuration. Defaults to headings.json next to this module.
+
+    Return:
+    - config: Mapping with 'version', 'threshold', 'headings' (section -> headings, in section
+              priority order) and 'keywords' (section -> keywords used for headingless decisions).
+    """
+    path = os.path.abspath(path or DEFAULT_HEADINGS_PATH)
+    if path not in _configs:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if data.get('version') != HEADINGS_CONFIG_VERSION:
+            raise ValueError(f"{path}: unsupported heading config version {data.get('version')!r}, "
+                             f"expected {HEADINGS_CONFIG_VERSION}")
+        headings = data.get('headings', {})
+        missing = [section for section in HEADING_SECTIONS if section not in headings]
+        if missing:
+            raise ValueError(f"{path}: no headings for sections {missing}")
+        _configs[path] = MappingProxyType({
+            'version': data['version'],
+            'threshold': data.get('threshold', 75),
+            'headings': MappingProxyType({
+                section: tuple(heading.lower() for heading in headings[section]) for section in HEADING_SECTIONS
+            }),
+            'keywords': MappingProxyType({
+                section: tuple(keyword.lower() for keyword in keywords)
+                for section, keywords in data.get('keywords', {}).items()
+            }),
+        })
+    return _configs[path]
+
+
+def heading_settings(config: Mapping) -> dict:
+    """
+    JSON-serializable copy of a heading configuration, e.g. for cache keys.
+    """
+    return {
+        'version': config['version'],
+        'threshold': config['threshold'],
+        'headings': {section: list(headings) for section, headings in config['headings'].items()},
+        'keywords': {section: list(keywords) for section, keywords in config['keywords'].items()},
+    }
+
+
+_default_config = load_heading_config()
+
+title_headings = _default_config['headings']['title']
+facts_headings = _default_config['headings']['facts']
+issues_headings = _default_config['headings']['issues']
+ruling_headings = _default_config['headings']['rulings']
+issue_kw = _default_config['keywords'].get('issues', ())
+rulings_kw = _default_config['keywords'].get('rulings', ())
@@ -0,0 +1,188 @@
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional
+
+from AtomicFile import write_text
+
+# Metrics of the case being processed in the current context, or None when instrumentation is off
+_active_metrics = ContextVar('active_metrics', default=None)
+_disabled = nullcontext()
+
+
+class CaseMetrics:
+    def __init__(self, case: str):
+        """
+        Description:
+        Collect the stage durations and counters of one case.
+
+        Parameters:
+        - case: Identifier of the case (its folder path).
+        """
+        self.case = case
+        self.durations = {}
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block and add its duration to the named stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self) -> Dict:
+        return {'case': self.case, 'durations': self.durations, 'counts': self.counts}
+
+
+def activate(metrics: Optional[CaseMetrics]):
+    """
+    Description:
+    Make the given metrics the target of timed() and record() for the duration of a with block.
+
+    Parameters:
+    - metrics: The case metrics to collect into, or None to leave instrumentation off.
+
+    Return:
+    - context: A context manager.
+    """
+    if metrics is None:
+        return _disabled
+    return _activation(metrics)
+
+
+@contextmanager
+def _activation(metrics: CaseMetrics):
+    token = _active_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _active_metrics.reset(token)
+
+
+def timed(name: str):
+    """
+    Context manager timing a block as the named stage of the active case. Does nothing when no case is active.
+    """
+    metrics = _active_metrics.get()
+    if metrics is None:
+        return _disabled
+    return metrics.stage(name)
+
+
+def timed_stage(name: str):
+    """
+    Decorator timing every call of a function as the named stage of the active case.
+    When no case is active the function is called directly.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics = _active_metrics.get()
+            if metrics is None:
+                return function(*args, **kwargs)
+            with metrics.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(**counts):
+    """
+    Add counters (sentence counts, matrix shape, ...) to the active case. Does nothing when no case is active.
+    Values of the same counter are summed over repeated calls.
+    """
+    metrics = _active_metrics.get()
+    if metrics is None:
+        return
+    for name, value in counts.items():
+        metrics.counts[name] = metrics.counts.get(name, 0) + value
+
+
+def is_active() -> bool:
+    """
+    Whether a case is currently collecting metrics; lets callers skip computing expensive counters.
+    """
+    return _active_metrics.get() is not None
+
+
+class JsonlSink:
+    def __init__(self, output_file: str):
+        """
+        Description:
+        Append one JSON object per case to a file.
+
+        Parameters:
+        - output_file: The JSON Lines file to append to.
+        """
+        self.output_file = output_file
+
+    def write(self, result: Dict):
+        metrics = result.get('metrics') or {}
+        line = {
+            'case': result['case'],
+            'ok': result['ok'],
+            'cached': result.get('cached', False),
+            'seconds': result['seconds'],
+            'durations': metrics.get('durations', {}),
+            'counts': metrics.get('counts', {}),
+        }
+        with open(self.output_file, 'a', encoding='utf-8') as out_file:
+            out_file.write(json.dumps(line) + "\n")
+
+    def close(self):
+        pass
+
+
+class PrometheusSink:
+    def __init__(self, output_file: str):
+        """
+        Description:
+        Aggregate case metrics and write them in the Prometheus text exposition format,
+        e.g. for the node_exporter textfile collector.
+
+        Parameters:
+        - output_file: The .prom file written on close().
+        """
+        self.output_file = output_file
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.counts = {}
+        self.cases = {}
+
+    def write(self, result: Dict):
+        status = 'failed' if not result['ok'] else 'cached' if result.get('cached') else 'ok'
+        self.cases[status] = self.cases.get(status, 0) + 1
+        metrics = result.get('metrics') or {}
+        for stage, seconds in metrics.get('durations', {}).items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+        for name, value in metrics.get('counts', {}).items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def close(self):
+        lines = [
+            "# HELP summarizer_cases_total Cases processed, by outcome.",
+            "# TYPE summarizer_cases_total counter",
+        ]
+        lines += [f'summarizer_cases_total{{status="{status}"}} {count}' for status, count in sorted(self.cases.items())]
+        lines += [
+            "# HELP summarizer_stage_seconds Time spent in each pipeline stage.",
+            "# TYPE summarizer_stage_seconds summary",
+        ]
+        for stage in sorted(self.stage_seconds):
+            lines.append(f'summarizer_stage_seconds_sum{{stage="{stage}"}} {self.stage_seconds[stage]:.6f}')
+            lines.append(f'summarizer_stage_seconds_count{{stage="{stage}"}} {self.stage_calls[stage]}')
+        lines += [
+            "# HELP summarizer_items_total Pipeline counters summed over all cases.",
+            "# TYPE summarizer_items_total counter",
+        ]
+        lines += [f'summarizer_items_total{{name="{name}"}} {value}' for name, value in sorted(self.counts.items())]
+
+        # Write to a temporary file and rename so scrapers never read a partial file
+        write_text(self.output_file, "\n".join(lines) + "\n")
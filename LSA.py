@@ -1,11 +1,26 @@
 import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import TruncatedSVD
 from typing import List, Dict
 
+from AtomicFile import write_text
+from Instrumentation import timed_stage, record, is_active
+from SentenceTable import SentenceTable, LABEL_CODES, to_label_codes, top_k
+
+
+def tokens_analyzer(tokens: List[str]) -> List[str]:
+    """
+    Analyzer for sentences already tokenized by Preprocessing.
+    Lowercases the tokens and drops pure punctuation; stop words were removed upstream.
+    """
+    return [token.lower() for token in tokens if any(char.isalnum() for char in token)]
+
+
 class LSA:
-    def __init__(self, text_dict: dict, facts_pct=0.5, issues_pct=0.05, ruling_pct=0.45):
+    SCORING_METHODS = ('sum', 'length', 'topic')
+    SVD_ALGORITHMS = ('randomized', 'arpack')
+
+    def __init__(self, text_dict: dict, facts_pct=0.5, issues_pct=0.05, ruling_pct=0.45,
+                 n_components=1, algorithm='randomized', n_iter=5, random_state=0, scoring='sum',
+                 vectorizer=None, tokens_dict=None, dedupe_threshold=None):
         """
         Description:
         Initialize the LSA class with text data and percentage parameters for generating the summary.
@@ -16,51 +31,181 @@ class LSA:
         - facts_pct: The percentage of sentences to include in the 'facts' section of the summary.
         - issues_pct: The percentage of sentences to include in the 'issues' section of the summary.
         - ruling_pct: The percentage of sentences to include in the 'rulings' section of the summary.
+        - n_components: The number of latent topics kept by the SVD.
+        - algorithm: The SVD solver, 'randomized' (faster on long decisions) or 'arpack' (exact).
+        - n_iter: Number of power iterations of the randomized solver.
+        - random_state: Seed of the SVD solver so that runs are reproducible. None uses global randomness.
+        - scoring: How sentences are scored from the SVD matrix:
+            - 'sum': sum of the sentence's topic weights.
+            - 'length': Steinberger-Jezek vector length, sqrt(sum_k (sigma_k * v_ik)^2).
+            - 'topic': Gong-Liu selection, taking the strongest remaining sentence of each topic in turn.
+        - vectorizer: An already fitted TF-IDF vectorizer (e.g. fitted over the whole corpus). When given,
+                      each case is only transformed with it instead of fitting a new vectorizer.
+        - tokens_dict: Optional pre-tokenized form of text_dict with the same keys, where each sentence is a
+                       list of tokens (as produced by Preprocessing.split_sections). When given, the term
+                       matrix is built from these tokens and the sentences are not tokenized again.
+        - dedupe_threshold: When given, near-duplicate sentences (word 3-gram Jaccard similarity of at least
+                            this value, found with MinHash/LSH) are collapsed onto their first occurrence
+                            before the term matrix is built. See remove_near_duplicates.
         """
+        if scoring not in self.SCORING_METHODS:
+            raise ValueError(f"Unknown scoring '{scoring}', expected one of {self.SCORING_METHODS}")
+        if algorithm not in self.SVD_ALGORITHMS:
+            raise ValueError(f"Unknown SVD algorithm '{algorithm}', expected one of {self.SVD_ALGORITHMS}")
+
         self.text_dict = text_dict
         self.facts_pct = facts_pct
         self.issues_pct = issues_pct
         self.ruling_pct = ruling_pct
+        self.n_components = n_components
+        self.algorithm = algorithm
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.scoring = scoring
+        self.vectorizer = vectorizer
+        self.tokens_dict = tokens_dict
+        self.dedupe_threshold = dedupe_threshold
         self.labels = ['facts', 'issues', 'rulings']
+        # Set by build_matrix when deduplicating: original index of every kept sentence, the kept
+        # sentence every original sentence collapsed onto, and how much the term matrix shrank
+        self.positions = None
+        self.representatives = None
+        self.dedupe_report = None
 
     def preprocess_text(self):
         """
         Description:
-        Preprocess the text by concatenating sentences from each label category.
+        Preprocess the text by concatenating sentences from each label category into a columnar table.
 
         Parameters: None
 
         Return:
-        - sentences: A list of all sentences.
+        - sentences: A SentenceTable of all sentences (a read-only sequence of strings that also holds
+                     the int8 label codes).
         - labels: A list of labels corresponding to each sentence ('facts', 'issues', 'rulings').
         """
-        sentences = []
-        labels = []
+        table = SentenceTable.from_sections(self.text_dict)
+        return table, table.labels
+
+    def preprocess_tokens(self):
+        """
+        Description:
+        Concatenate the pre-tokenized sentences in the same order as preprocess_text.
 
-        for label, sentence_list in self.text_dict.items():
-            for sentence in sentence_list:
-                sentences.append(sentence)
-                labels.append(label)
-        
-        return sentences, labels
+        Parameters: None
 
-    def create_term_matrix(self, sentences):
+        Return:
+        - tokens: A list of token lists aligned with the sentences, or None when no tokens were given.
+        """
+        if self.tokens_dict is None:
+            return None
+        return [tokens for label in self.text_dict for tokens in self.tokens_dict[label]]
+
+    @timed_stage('dedupe')
+    def remove_near_duplicates(self, sentences, tokens=None):
+        """
+        Description:
+        Collapse near-duplicate sentences (e.g. the information or a lower court ruling quoted again
+        in full) onto their first occurrence, and record the mapping back to the original positions
+        in self.positions and self.representatives.
+
+        Parameters:
+        - sentences: SentenceTable of all sentences.
+        - tokens: Optional list of token lists aligned with the sentences.
+
+        Return:
+        - sentences: SentenceTable of the kept sentences.
+        - labels: A list of labels corresponding to each kept sentence.
+        - tokens: The token lists of the kept sentences, or None.
+        - removed: The removed sentences (SentenceTable) and their token lists (or None).
+        """
+        # Imported here; only needed when deduplicating
+        from NearDuplicates import deduplicate
+
+        # Only merged within a section so that every section keeps its own sentences for its budget
+        result = deduplicate(sentences, tokens, self.dedupe_threshold, sentences.label_codes)
+        self.positions = result['positions']
+        self.representatives = result['representatives']
+        removed_positions = np.flatnonzero(self.representatives != np.arange(len(sentences)))
+        self.dedupe_report = {
+            'threshold': self.dedupe_threshold,
+            'sentences': len(sentences),
+            'kept': len(self.positions),
+            'removed': len(removed_positions),
+            'groups': result['groups'],
+        }
+
+        kept = sentences.take(self.positions)
+        removed = (sentences.take(removed_positions),
+                   None if tokens is None else [tokens[i] for i in removed_positions.tolist()])
+        kept_tokens = None if tokens is None else [tokens[i] for i in self.positions.tolist()]
+        return kept, kept.labels, kept_tokens, removed
+
+    @timed_stage('create_term_matrix')
+    def create_term_matrix(self, sentences, tokens=None):
         """
         Description:
         Create a term-sentence matrix using TF-IDF vectorization.
 
         Parameters:
         - sentences: List of sentences to be vectorized.
+        - tokens: Optional list of token lists aligned with the sentences. When given they are used
+                  as-is instead of letting the vectorizer tokenize the sentences.
 
         Return:
         - term_matrix: The term-sentence matrix produced by the TF-IDF vectorizer.
         - vectorizer: The fitted TF-IDF vectorizer.
         """
+        # Imported here so that importing LSA does not load scikit-learn
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        if tokens is not None:
+            if self.vectorizer is not None:
+                return self.build_term_matrix(tokens, self.vectorizer), self.vectorizer
+            vectorizer = TfidfVectorizer(analyzer=tokens_analyzer)
+            return vectorizer.fit_transform(tokens), vectorizer
+
+        if self.vectorizer is not None:
+            return self.vectorizer.transform(sentences), self.vectorizer
+
         vectorizer = TfidfVectorizer(stop_words='english')
         term_matrix = vectorizer.fit_transform(sentences)
         return term_matrix, vectorizer
 
-    def apply_svd(self, term_matrix, n_components=1):
+    def build_term_matrix(self, tokens, vectorizer):
+        """
+        Description:
+        Build the TF-IDF matrix of pre-tokenized sentences directly from a fitted vectorizer's
+        vocabulary and IDF weights, without running its string analyzer.
+
+        Parameters:
+        - tokens: List of token lists, one per sentence.
+        - vectorizer: A fitted TF-IDF vectorizer (l2 norm, raw term frequency).
+
+        Return:
+        - term_matrix: The L2-normalized TF-IDF term-sentence matrix.
+        """
+        from scipy.sparse import csr_matrix
+        from sklearn.preprocessing import normalize
+
+        vocabulary = vectorizer.vocabulary_
+        indptr = [0]
+        indices = []
+        for sentence_tokens in tokens:
+            for token in tokens_analyzer(sentence_tokens):
+                index = vocabulary.get(token)
+                if index is not None:
+                    indices.append(index)
+            indptr.append(len(indices))
+
+        term_matrix = csr_matrix((np.ones(len(indices)), indices, indptr),
+                                 shape=(len(tokens), len(vocabulary)))
+        term_matrix.sum_duplicates()
+        term_matrix.data *= vectorizer.idf_[term_matrix.indices]
+        return normalize(term_matrix, norm='l2', copy=False)
+
+    @timed_stage('apply_svd')
+    def apply_svd(self, term_matrix, n_components=None):
         """
         Description:
         Apply Singular Value Decomposition (SVD) to reduce the dimensionality of the term-sentence matrix.
@@ -68,14 +213,49 @@ class LSA:
         Parameters:
         - term_matrix: The term-sentence matrix generated by TF-IDF vectorization.
         - n_components: The number of components to reduce the matrix to using SVD.
+                        Defaults to the n_components given to the constructor.
 
         Return:
         - svd_matrix: The reduced matrix obtained after applying SVD.
         """
-        svd = TruncatedSVD(n_components=n_components)
+        from sklearn.decomposition import TruncatedSVD
+
+        if n_components is None:
+            n_components = self.n_components
+        # The solvers need fewer components than the smaller matrix dimension
+        n_components = max(1, min(n_components, min(term_matrix.shape) - 1))
+
+        svd = TruncatedSVD(n_components=n_components, algorithm=self.algorithm,
+                           n_iter=self.n_iter, random_state=self.random_state)
         svd_matrix = svd.fit_transform(term_matrix)
         return svd_matrix
 
+    @timed_stage('rank_sentences')
+    def score_sentences(self, svd_matrix):
+        """
+        Description:
+        Compute a relevance score for each sentence from the SVD matrix.
+
+        Parameters:
+        - svd_matrix: The matrix from SVD containing sentence relevance scores.
+
+        Return:
+        - sentence_scores: A 1-D array with one relevance score per sentence.
+        """
+        if self.scoring == 'length':
+            # svd_matrix rows are already sigma-weighted topic vectors (U * Sigma)
+            return np.linalg.norm(svd_matrix, axis=1)
+
+        if self.scoring == 'topic':
+            # Walk the topics round-robin, taking each topic's next strongest sentence,
+            # and score sentences by how early they were taken
+            n_sentences = svd_matrix.shape[0]
+            order = np.argsort(-svd_matrix, axis=0, kind='stable')
+            _, first_seen = np.unique(order.ravel(), return_index=True)
+            return (n_sentences - np.argsort(np.argsort(first_seen, kind='stable'))).astype(float)
+
+        return np.sum(svd_matrix, axis=1)
+
     def rank_sentences(self, svd_matrix):
         """
         Description:
@@ -87,24 +267,28 @@ class LSA:
         Return:
         - ranked_indices: A list of indices representing sentences ranked by relevance in descending order.
         """
-        sentence_scores = np.sum(svd_matrix, axis=1)
+        sentence_scores = self.score_sentences(svd_matrix)
         ranked_indices = np.argsort(sentence_scores)[::-1]  
         return ranked_indices
 
-    def select_top_sentences(self, ranked_indices, sentences, labels):
+    def section_limits(self, n_sentences, n_issues, total_sentences=None):
         """
         Description:
-        Select the top sentences for each label (facts, issues, ruling) based on the ranking and percentage distribution.
+        Compute how many sentences of each label the summary takes.
 
         Parameters:
-        - ranked_indices: The ranked indices of sentences based on relevance scores.
-        - sentences: List of original sentences.
-        - labels: List of labels corresponding to each sentence.
+        - n_sentences: Total number of sentences.
+        - n_issues: Number of 'issues' sentences, all of which are taken when the issues share rounds to zero.
+        - total_sentences: Optional target length of the summary. By default it is the number of
+                           sentences times the sum of the section percentages.
 
         Return:
-        - summary: A dictionary containing selected top sentences categorized by 'facts', 'issues', and 'rulings'.
+        - limits: A dictionary mapping 'facts', 'issues' and 'rulings' to their sentence counts.
         """
-        total_summary_sentences = int(len(sentences) * (self.facts_pct + self.issues_pct + self.ruling_pct))
+        if total_sentences is None:
+            total_summary_sentences = int(n_sentences * (self.facts_pct + self.issues_pct + self.ruling_pct))
+        else:
+            total_summary_sentences = min(total_sentences, n_sentences)
 
         # Calculate how many sentences to include from each section
         facts_count = int(self.facts_pct * total_summary_sentences)
@@ -113,116 +297,204 @@ class LSA:
 
         # Adjust issues_count to select all sentences if percentage is too small
         if issues_count == 0:
-            issues_count = sum(1 for label in labels if label == 'issues')
+            issues_count = n_issues
 
         # Ensure the total doesn't exceed total_summary_sentences
         remaining_count = total_summary_sentences - (facts_count + issues_count + ruling_count)
         if remaining_count > 0:
             ruling_count += remaining_count  # Assign remaining to ruling as a default strategy
 
-        summary = {"facts": [], "issues": [], "rulings": []}
+        return {'facts': facts_count, 'issues': issues_count, 'rulings': ruling_count}
 
-        # Select top sentences based on ranking while maintaining original order
-        ranked_sentences = [(sentences[i], labels[i]) for i in ranked_indices]
-        for sentence, label in ranked_sentences:
-            if label == 'facts' and len(summary['facts']) < facts_count:
-                summary['facts'].append(sentence)
-            elif label == 'issues' and len(summary['issues']) < issues_count:
-                summary['issues'].append(sentence)
-            elif label == 'rulings' and len(summary['rulings']) < ruling_count:
-                summary['rulings'].append(sentence)
+    @timed_stage('select_top_sentences')
+    def select_top_sentences(self, ranked_indices, sentences, labels, total_sentences=None):
+        """
+        Description:
+        Select the top sentences for each label (facts, issues, ruling) based on the ranking and percentage distribution.
 
-        return summary
+        Parameters:
+        - ranked_indices: The ranked indices of sentences based on relevance scores.
+        - sentences: List of original sentences.
+        - labels: List of labels corresponding to each sentence.
+        - total_sentences: Optional target length of the summary. By default it is the number of
+                           sentences times the sum of the section percentages.
 
-    def create_summary(self):
+        Return:
+        - selected: A dictionary mapping 'facts', 'issues' and 'rulings' to the indices of the selected
+                    sentences, in their original order.
+        """
+        label_codes = sentences.label_codes if isinstance(sentences, SentenceTable) else to_label_codes(labels)
+        # A sentence's priority is its place in the ranking, so the selection follows the ranking exactly
+        priority = np.empty(len(label_codes), dtype=np.int64)
+        priority[np.asarray(ranked_indices, dtype=np.int64)] = np.arange(len(label_codes), 0, -1)
+        n_issues = int(np.count_nonzero(label_codes == LABEL_CODES['issues']))
+        return top_k(priority, label_codes, self.section_limits(len(label_codes), n_issues, total_sentences))
+
+    @timed_stage('select_top_sentences')
+    def select_by_scores(self, scores, label_codes, total_sentences=None):
         """
         Description:
-        Create a summary based on LSA using sentence ranking, ensuring that the order is preserved from the original text.
+        Select the top sentences for each label straight from their scores, without ranking every sentence.
+        Ties at the cut go to the earliest sentences.
+
+        Parameters:
+        - scores: Array of relevance scores, one per sentence.
+        - label_codes: The int8 label code of every sentence (see SentenceTable).
+        - total_sentences: Optional target length of the summary.
+
+        Return:
+        - selected: A dictionary mapping 'facts', 'issues' and 'rulings' to the indices of the selected
+                    sentences, in their original order.
+        """
+        n_issues = int(np.count_nonzero(label_codes == LABEL_CODES['issues']))
+        return top_k(scores, label_codes, self.section_limits(len(label_codes), n_issues, total_sentences))
+
+    def summarize(self):
+        """
+        Description:
+        Run the LSA pipeline and return the selected sentences as a structured result.
 
         Parameters: None
 
         Return:
-        - summary_output: A string containing the formatted summary with sections for FACTS, ISSUES, and RULING.
+        - result: A dictionary with
+            - 'sentences': SentenceTable of all sentences, holding their label codes and scores.
+            - 'labels': List of labels corresponding to each sentence.
+            - 'scores': float32 array of relevance scores, one per sentence.
+            - 'indices': Indices of all selected sentences in original order.
+            - 'selected': Dictionary mapping each label to the indices of its selected sentences.
+            - 'positions': When deduplicating, int64 array giving the original position of every
+                           (kept) sentence; None otherwise, as positions are then the indices.
+        """
+        sentences, labels, term_matrix = self.build_matrix()
+
+        # Apply SVD to get relevance scores
+        svd_matrix = self.apply_svd(term_matrix)
+
+        return self.summarize_svd(sentences, labels, svd_matrix)
+
+    def build_matrix(self):
+        """
+        Description:
+        Gather the sentences and labels, drop near-duplicates when dedupe_threshold is set,
+        and build their term-sentence matrix.
+
+        Parameters: None
+
+        Return:
+        - sentences: A SentenceTable of all (kept) sentences.
+        - labels: A list of labels corresponding to each sentence.
+        - term_matrix: The TF-IDF term-sentence matrix.
         """
         # Preprocess text
         sentences, labels = self.preprocess_text()
+        tokens = self.preprocess_tokens()
+        removed = None
+        if self.dedupe_threshold is not None:
+            sentences, labels, tokens, removed = self.remove_near_duplicates(sentences, tokens)
 
         # Create term-sentence matrix
-        term_matrix, vectorizer = self.create_term_matrix(sentences)
+        term_matrix, vectorizer = self.create_term_matrix(sentences, tokens)
+        if removed is not None:
+            self.report_matrix_shrink(term_matrix, vectorizer, *removed)
+        if is_active():
+            record(sentences=len(sentences), matrix_rows=term_matrix.shape[0],
+                   matrix_cols=term_matrix.shape[1], matrix_nnz=term_matrix.nnz)
+            if self.dedupe_report is not None:
+                record(dedupe_removed=self.dedupe_report['removed'],
+                       dedupe_nnz_removed=self.dedupe_report['nnz_removed'])
+        return sentences, labels, term_matrix
+
+    def report_matrix_shrink(self, term_matrix, vectorizer, removed_sentences, removed_tokens=None):
+        """
+        Add to self.dedupe_report the rows and non-zeros the removed sentences would have added to the
+        term matrix, measured by transforming only them with the fitted vectorizer.
+        """
+        nnz_removed = 0
+        if len(removed_sentences):
+            if removed_tokens is not None:
+                nnz_removed = self.build_term_matrix(removed_tokens, vectorizer).nnz
+            else:
+                nnz_removed = vectorizer.transform(removed_sentences).nnz
+        rows_before = term_matrix.shape[0] + len(removed_sentences)
+        nnz_before = term_matrix.nnz + nnz_removed
+        self.dedupe_report.update({
+            'rows_before': rows_before,
+            'rows_after': term_matrix.shape[0],
+            'nnz_before': nnz_before,
+            'nnz_after': term_matrix.nnz,
+            'nnz_removed': nnz_removed,
+            'shrink': nnz_removed / nnz_before if nnz_before else 0.0,
+        })
+
+    def summarize_svd(self, sentences, labels, svd_matrix):
+        """
+        Description:
+        Score and select sentences from an SVD matrix computed by apply_svd or by a batched engine.
 
-        # Apply SVD to get relevance scores
-        svd_matrix = self.apply_svd(term_matrix)
+        Parameters:
+        - sentences: SentenceTable (or list) of all sentences.
+        - labels: List of labels corresponding to each sentence.
+        - svd_matrix: The reduced (sentences x components) matrix.
 
-        # Rank sentences based on relevance scores
-        ranked_indices = self.rank_sentences(svd_matrix)
+        Return:
+        - result: The structured result described in summarize().
+        """
+        if not isinstance(sentences, SentenceTable):
+            sentences = SentenceTable.from_rows(sentences, labels)
+        scores = self.score_sentences(svd_matrix).astype(np.float32)
+        sentences.scores = scores
+
+        # Select top sentences for summary by partial selection on the scores
+        selected = self.select_by_scores(scores, sentences.label_codes)
+
+        return {
+            'sentences': sentences,
+            'labels': labels,
+            'scores': scores,
+            'indices': sorted(i for indices in selected.values() for i in indices),
+            'selected': selected,
+            'positions': self.positions,
+        }
+
+    def format_summary(self, result):
+        """
+        Description:
+        Format a structured summary result into text with sections for FACTS, ISSUES, and RULINGS.
 
-        # Select top sentences for summary
-        summary = self.select_top_sentences(ranked_indices, sentences, labels)
+        Parameters:
+        - result: The dictionary returned by summarize().
+
+        Return:
+        - summary_output: A string containing the formatted summary.
+        """
+        sentences = result['sentences']
+        selected = result['selected']
 
-        # Construct the output in proper order for each section
         summary_output = "FACTS:\n"
-        summary_output += " ".join([sentence for sentence in sentences if sentence in summary['facts']]) + "\n\n"
+        summary_output += " ".join(sentences[i] for i in selected['facts']) + "\n\n"
         summary_output += "ISSUES:\n"
-        summary_output += " ".join([sentence for sentence in sentences if sentence in summary['issues']]) + "\n\n"
+        summary_output += " ".join(sentences[i] for i in selected['issues']) + "\n\n"
         summary_output += "RULINGS:\n"
-        summary_output += " ".join([sentence for sentence in sentences if sentence in summary['rulings']])
+        summary_output += " ".join(sentences[i] for i in selected['rulings'])
 
         return summary_output
 
+    def create_summary(self):
+        """
+        Description:
+        Create a summary based on LSA using sentence ranking, ensuring that the order is preserved from the original text.
+
+        Parameters: None
+
+        Return:
+        - summary_output: A string containing the formatted summary with sections for FACTS, ISSUES, and RULING.
+        """
+        return self.format_summary(self.summarize())
+
     def save_summary(self, output_file: str, summary: Dict[str, List[str]]):
         """
-        Save the generated summary to a file.
+        Save the generated summary to a file. The summary is written to a temporary file and renamed
+        into place, so readers never see a partially written summary.
         """
-        with open(output_file, 'w', encoding='utf-8') as out_file:
-            out_file.write(summary)
-import os
-import numpy as np
-from PartSegmentation import PartSegmentation
-from Preprocessing import Preprocessing
-
-# Usage Example
-if __name__ == "__main__":
-    segmenter = PartSegmentation()
-    preprocessor = Preprocessing()
-    
-    # Path to the main folder containing all court cases
-    main_folder_path = "Court_Cases"
-    
-    # Loop through each folder inside the main folder
-    for folder_name in os.listdir(main_folder_path):
-        folder_path = os.path.join(main_folder_path, folder_name)
-        
-        if os.path.isdir(folder_path):
-            case_file_path = os.path.join(folder_path, 'court case.txt')
-            
-            if os.path.isfile(case_file_path):
-                # Read and segment the text
-                text = segmenter.read_file(case_file_path)
-                sections = segmenter.segment_by_headings(text)
-
-                # Preprocess the segmented sections
-                preprocessed_sections = preprocessor.preprocess_sections(sections)
-
-                # Define the percentages for each section of the summary
-                section_percentages = {
-                    'title': 1,  
-                    'facts': 0.50,
-                    'issues': 0.05,
-                    'rulings': 0.45
-                }
-
-                # Collect all heading keywords for exclusion in the summary
-                headings = {
-                    'title': segmenter.title_headings,
-                    'facts': segmenter.facts_headings,
-                    'issues': segmenter.issues_headings,
-                    'rulings': segmenter.ruling_headings
-                }
-                
-                lsa = LSA(sections)
-                summary = lsa.create_summary()
-                
-                # Path to save the summary file
-                summary_file_path = os.path.join(folder_path, 'summit_summary.txt')
-                
-                lsa.save_summary(summary_file_path, summary)
+        write_text(output_file, summary)
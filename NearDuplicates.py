@@ -0,0 +1,174 @@
+import re
+import zlib
+from typing import List, Dict, Optional
+
+import numpy as np
+
+DEFAULT_JACCARD_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+SHINGLE_SIZE = 3
+# Shingles permuted at once by minhash_signatures: 12 bytes per shingle and hash function, 3 MB with 64 functions
+MINHASH_CHUNK_SHINGLES = 4096
+
+WORD = re.compile(r'\w+')
+
+# Multiply-shift hash functions (a odd): h(x) = ((a * x + b) mod 2^64) >> 32
+_HASH_SEED = 20240101
+
+
+def word_shingles(words: List[str], size: int = SHINGLE_SIZE) -> frozenset:
+    """
+    Set of word n-grams of a sentence. Sentences shorter than the shingle size are a single shingle.
+    """
+    if len(words) < size:
+        return frozenset([tuple(words)]) if words else frozenset()
+    return frozenset(tuple(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def sentence_words(sentence: str) -> List[str]:
+    """
+    Lowercased words of a raw sentence, for sentences that were not tokenized by Preprocessing.
+    """
+    return WORD.findall(sentence.lower())
+
+
+def minhash_signatures(shingle_sets: List[frozenset], num_perm: int = DEFAULT_NUM_PERM) -> np.ndarray:
+    """
+    Description:
+    MinHash signatures of shingle sets, computed for all sets at once: every shingle is hashed to
+    32 bits with CRC-32, permuted by num_perm multiply-shift hash functions, and reduced to the
+    minimum per set. Shingles are permuted MINHASH_CHUNK_SHINGLES at a time into a running minimum,
+    so memory does not grow with the number of sentences.
+
+    Parameters:
+    - shingle_sets: The shingle set of every sentence. Empty sets get an all-ones signature.
+    - num_perm: Number of hash functions (signature length).
+
+    Return:
+    - signatures: uint32 array of shape (len(shingle_sets), num_perm).
+    """
+    signatures = np.full((len(shingle_sets), num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    sizes = np.fromiter((len(shingles) for shingles in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+    if not sizes.sum():
+        return signatures
+    hashes = np.fromiter(
+        (zlib.crc32('\x1f'.join(shingle).encode('utf-8')) for shingles in shingle_sets for shingle in shingles),
+        dtype=np.uint64, count=int(sizes.sum()),
+    )
+    rng = np.random.default_rng(_HASH_SEED)
+    a = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    owners = np.repeat(np.arange(len(shingle_sets)), sizes)
+    for start in range(0, len(hashes), MINHASH_CHUNK_SHINGLES):
+        chunk_owners = owners[start:start + MINHASH_CHUNK_SHINGLES]
+        # uint64 arithmetic wraps, which is the mod 2^64 of the hash family
+        permuted = ((a[:, None] * hashes[None, start:start + MINHASH_CHUNK_SHINGLES] + b[:, None])
+                    >> np.uint64(32)).astype(np.uint32)
+        # Owners are sorted, so every set in the chunk is one run of columns
+        runs = np.flatnonzero(np.diff(chunk_owners, prepend=-1))
+        sets = chunk_owners[runs]
+        signatures[sets] = np.minimum(signatures[sets], np.minimum.reduceat(permuted, runs, axis=1).T)
+    return signatures
+
+
+def _jaccard(first: frozenset, second: frozenset) -> float:
+    return len(first & second) / len(first | second)
+
+
+def find_near_duplicates(word_lists: List[List[str]], threshold: float = DEFAULT_JACCARD_THRESHOLD,
+                         num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS,
+                         groups: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Description:
+    Group near-duplicate sentences with MinHash and LSH banding. Sentences whose signatures agree on
+    every row of some band become candidates; a candidate is only merged when the exact Jaccard
+    similarity of the shingle sets reaches the threshold, so banding only decides what is compared.
+    Within a bucket each sentence is compared with the bucket's group heads rather than every member,
+    so repeated passages cost one comparison per copy. When groups are given, the group is part of
+    every bucket key, so only sentences of the same group are merged.
+
+    Parameters:
+    - word_lists: The words of every sentence, in document order.
+    - threshold: The minimum Jaccard similarity of word 3-gram sets for two sentences to be duplicates.
+    - num_perm: Number of MinHash functions.
+    - bands: Number of LSH bands; num_perm must be divisible by it. More bands find less similar pairs.
+    - groups: Optional integer group of every sentence (e.g. its section label code).
+
+    Return:
+    - representatives: int64 array giving, for every sentence, the index of the earliest sentence
+                       of its group (itself when it is kept).
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    count = len(word_lists)
+    shingle_sets = [word_shingles(words) for words in word_lists]
+    signatures = minhash_signatures(shingle_sets, num_perm)
+    parents = np.arange(count, dtype=np.int64)
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    candidates = np.flatnonzero([bool(shingles) for shingles in shingle_sets])
+    rows = num_perm // bands
+    for band in range(bands):
+        keys = signatures[candidates, band * rows:(band + 1) * rows]
+        if groups is not None:
+            keys = np.column_stack((keys, np.asarray(groups)[candidates].astype(np.uint32)))
+        keys = np.ascontiguousarray(keys)
+        _, bucket_ids, bucket_sizes = np.unique(keys.view(np.dtype((np.void, keys.dtype.itemsize * keys.shape[1]))).ravel(),
+                                                return_inverse=True, return_counts=True)
+        shared = bucket_sizes[bucket_ids] > 1
+        heads = {}
+        for index, bucket in zip(candidates[shared].tolist(), bucket_ids[shared].tolist()):
+            bucket_heads = heads.setdefault(bucket, [])
+            root = find(index)
+            for head in bucket_heads:
+                head_root = find(head)
+                if head_root == root or _jaccard(shingle_sets[head], shingle_sets[index]) >= threshold:
+                    # The earliest sentence of a group is its root
+                    parents[max(root, head_root)] = min(root, head_root)
+                    break
+            else:
+                bucket_heads.append(index)
+
+    return np.fromiter((find(index) for index in range(count)), dtype=np.int64, count=count)
+
+
+def deduplicate(sentences, tokens: Optional[List[List[str]]] = None,
+                threshold: float = DEFAULT_JACCARD_THRESHOLD, label_codes: Optional[np.ndarray] = None) -> Dict:
+    """
+    Description:
+    Find the sentences to keep after collapsing near-duplicates onto their earliest occurrence.
+
+    Parameters:
+    - sentences: The sentences of a case, in document order.
+    - tokens: Optional token lists aligned with the sentences (as produced by Preprocessing). Without
+              them the sentences are split into words here.
+    - threshold: The minimum Jaccard similarity for two sentences to be duplicates.
+    - label_codes: Optional section label code of every sentence. Sentences are then only merged within
+                   a section, so e.g. the Court's own dispositive sentence in the rulings is not collapsed
+                   onto a lower court's quoted one in the facts and stays in the rulings budget.
+
+    Return:
+    - result: Dictionary with
+        - 'positions': int64 array of the original indices of the kept sentences, ascending.
+        - 'representatives': int64 array mapping every original sentence to the kept sentence it collapsed onto.
+        - 'groups': Number of kept sentences that absorbed at least one duplicate.
+    """
+    if tokens is not None:
+        word_lists = [[token.lower() for token in sentence_tokens if any(char.isalnum() for char in token)]
+                      for sentence_tokens in tokens]
+    else:
+        word_lists = [sentence_words(sentence) for sentence in sentences]
+    representatives = find_near_duplicates(word_lists, threshold, groups=label_codes)
+    positions = np.flatnonzero(representatives == np.arange(len(representatives)))
+    return {
+        'positions': positions,
+        'representatives': representatives,
+        'groups': int(np.count_nonzero(np.bincount(representatives, minlength=len(representatives))[positions] > 1)),
+    }
@@ -1,96 +1,152 @@
-from fuzzywuzzy import fuzz
-from typing import List, Dict
+import os
+from itertools import groupby
+from operator import itemgetter
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+
+from HeadingMatcher import HeadingMatcher
+from HeadingsKeywords import load_heading_config, DEFAULT_HEADINGS_PATH
+from SectionClassifier import SectionClassifier
+from Instrumentation import timed_stage, record, is_active
+
+# Precompiled heading matcher and keyword classifier per heading configuration, built once per process
+_shared = {}
+
+
+def shared_matchers(headings_path: Optional[str] = None,
+                    threshold: Optional[int] = None) -> Tuple[HeadingMatcher, SectionClassifier]:
+    """
+    Return the heading matcher and section classifier of a heading configuration, building them on first use.
+    The threshold defaults to the one in the configuration.
+    """
+    key = (os.path.abspath(headings_path or DEFAULT_HEADINGS_PATH), threshold)
+    if key not in _shared:
+        config = load_heading_config(headings_path)
+        _shared[key] = (
+            # Checked in section priority order: title, facts, issues, rulings
+            HeadingMatcher(config['headings'], config['threshold'] if threshold is None else threshold),
+            # Keyword and position based fallback for decisions without section headings
+            SectionClassifier(config['keywords']),
+        )
+    return _shared[key]
+
 
 class PartSegmentation:
-    def __init__(self):
-        # Initialize headings and keywords for different sections
-        self.title_headings = ["decision", "en banc", "resolution"]
-
-        self.facts_headings = [
-            'facts',
-            'antecedents',
-            'the antecedents',
-            'the factual antecedents',
-            'evidence for the prosecution',
-            'evidence for the defense',
-            'ruling of the rtc',
-            'ruling of the ca',
-            'the ruling of the ca',
-            'the charges',
-            'the defense\'s version',
-            'defense\'s version',
-            'the prosecution\'s version',
-            'proceedings before the court of appeals',
-            'the facts',
-            'version of the prosecution',
-            'version of the defense',
-            'the facts and the case'
-        ]
-        self.issues_headings = [
-            'the issue',
-            'the issues'
-            'the issues presented',
-            'the issue before the court',
-            'the issues before the court',
-            'issue',
-            'issues',
-            'the present',
-            'petition',
-            'presented',
-        ]
-        self.ruling_headings = [
-            'our ruling',
-            'the ruling of the court',
-            'the rulings of the court',
-            'the ruling of this court',
-            'proper penalty',
-            'the court\'s ruling',
-        ]
+    def __init__(self, headings_path: Optional[str] = None, threshold: Optional[int] = None):
+        """
+        Set up segmentation with the headings and keywords of a heading configuration (headings.json by default).
+        The heading similarity threshold (0-100) defaults to the one in the configuration.
+        """
+        self.heading_config = load_heading_config(headings_path)
+        self.title_headings = self.heading_config['headings']['title']
+        self.facts_headings = self.heading_config['headings']['facts']
+        self.issues_headings = self.heading_config['headings']['issues']
+        self.ruling_headings = self.heading_config['headings']['rulings']
+
+        self.heading_matcher, self.section_classifier = shared_matchers(headings_path, threshold)
+        self._matchers = {}
 
     def is_similar_heading(self, line: str, headings: List[str], threshold: int = 75) -> bool:
         """
         Check if the line is similar to any of the provided headings based on a similarity threshold.
         """
-        line_lower = line.lower()
-        for heading in headings:
-            if fuzz.ratio(line_lower, heading.lower()) >= threshold:
-                print(f"Matched heading: '{line}' to '{heading}'")  # Debugging line
-                return True
-        return False
+        key = (tuple(headings), threshold)
+        if key not in self._matchers:
+            self._matchers[key] = HeadingMatcher({'heading': headings}, threshold)
+        return self._matchers[key].match(line) is not None
+
+    def segment_stream(self, fileobj: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """
+        Lazily split lines into sections based on headings.
+        Accepts an open file handle or any iterable of lines and yields (section_name, line)
+        pairs for every non-empty line, so only the current line is held in memory.
+        Every item is split again with str.splitlines, so a file handle, which only splits on
+        newlines, gives the same lines as a whole text (e.g. form feeds from PDF extraction).
+        """
+        current_section = 'title'  # Default initial section is 'title'
+
+        for chunk in fileobj:
+            for line in chunk.splitlines():
+                line = line.strip()
+
+                # Detect section headings
+                matched_section = self.heading_matcher.match(line)
+                if matched_section is not None:
+                    current_section = matched_section
+
+                if line:
+                    yield current_section, line
+
+    def segment_chunks(self, fileobj: Iterable[str]) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Lazily split lines into per-section chunks.
+        Yields (section_name, lines) for every run of consecutive lines in the same section,
+        so memory is bounded by the largest section rather than the whole file.
+        """
+        for section, pairs in groupby(self.segment_stream(fileobj), key=itemgetter(0)):
+            yield section, [line for _, line in pairs]
 
+    @timed_stage('segment')
     def segment_by_headings(self, text: str) -> Dict[str, List[str]]:
         """
         Split the text into sections based on headings.
         Returns a dictionary where keys are section names and values are lists of sentences in that section.
         """
-        # Initialize sections
+        return self._collect_sections(self.segment_stream(text.splitlines()))
+
+    @timed_stage('segment')
+    def segment_lines(self, lines: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Split already separated lines (e.g. from CorpusPack.CorpusReader.lines) into sections based on headings.
+        """
+        return self._collect_sections(self.segment_stream(lines))
+
+    @timed_stage('segment')
+    def segment_file(self, input_file: str) -> Dict[str, List[str]]:
+        """
+        Split a file into sections based on headings, streaming it line by line
+        instead of reading the whole text first.
+        """
+        with open(input_file, 'r', encoding='utf-8') as file:
+            return self._collect_sections(self.segment_stream(file))
+
+    def _collect_sections(self, pairs: Iterable[Tuple[str, str]]) -> Dict[str, List[str]]:
+        """
+        Gather (section_name, line) pairs into a dictionary of lists.
+        """
         sections = {
             'title': [],
             'facts': [],
             'issues': [],
             'rulings': []
         }
-        current_section = 'title'  # Default initial section is 'title'
-
-        for line in text.splitlines():
-            line = line.strip()
-            
-            # Detect section headings
-            if self.is_similar_heading(line, self.title_headings):
-                current_section = 'title'
-            elif self.is_similar_heading(line, self.facts_headings):
-                current_section = 'facts'
-            elif self.is_similar_heading(line, self.issues_headings):
-                current_section = 'issues'
-            elif self.is_similar_heading(line, self.ruling_headings):
-                current_section = 'rulings'
-
-            # Append the current line to the appropriate section
-            if line:
-                sections[current_section].append(line)
-
+        for section, line in pairs:
+            sections[section].append(line)
+        if not (sections['facts'] or sections['issues'] or sections['rulings']):
+            self.classify_headingless(sections)
+        if is_active():
+            record(**{f'{section}_lines': len(lines) for section, lines in sections.items()})
         return sections
 
+    def classify_headingless(self, sections: Dict[str, List[str]]):
+        """
+        Relabel the body of a decision that has no facts, issues or ruling headings.
+        Lines up to the last title heading (e.g. 'DECISION' or 'D E C I S I O N') stay in the title;
+        the rest are labelled by the keyword classifier.
+        """
+        title_lines = sections['title']
+        body_start = 0
+        for index, line in enumerate(title_lines):
+            if self.heading_matcher.match(line.replace(' ', '')) == 'title':
+                body_start = index + 1
+        body = title_lines[body_start:]
+        if not body:
+            return
+        sections['title'] = title_lines[:body_start]
+        for label, line in zip(self.section_classifier.classify(body), body):
+            sections[label].append(line)
+        if is_active():
+            record(classified_lines=len(body))
+
     def read_file(self, input_file: str):
         """
         Reads the input file.
@@ -112,9 +168,8 @@ class PartSegmentation:
    
 # Example usage
 if __name__ == "__main__":
-    
+    segmenter = PartSegmentation()
     for i in range(5):
-        segmenter = PartSegmentation()
         text = segmenter.read_file(f"txt_files/sample_{i+1}/court_case.txt")
                 
         # Segment the text by headings
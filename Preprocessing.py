@@ -1,28 +1,93 @@
-import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.corpus import stopwords
-from typing import List, Dict
+import os
+from typing import List, Dict, Tuple
+
+from Instrumentation import timed_stage, record
+
+# Local folder holding the NLTK data, filled once with `python main.py prepare-resources`
+DEFAULT_NLTK_DATA_DIR = os.environ.get('NLTK_DATA', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+
+# NLTK resource name -> path looked up by nltk.data.find
+NLTK_RESOURCES = {
+    'punkt_tab': 'tokenizers/punkt_tab/english/',
+    'stopwords': 'corpora/stopwords',
+}
+
+_found_resources = set()
+
+
+class MissingResourceError(LookupError):
+    """
+    Raised when an NLTK resource is not installed locally. Resources are never downloaded on use.
+    """
+
+
+def ensure_resource(name: str, data_dir: str = DEFAULT_NLTK_DATA_DIR):
+    """
+    Make sure an NLTK resource is available locally, checking the disk only on first use.
+    Raises MissingResourceError instead of trying to download it.
+    """
+    if name in _found_resources:
+        return
+    # NLTK is imported on first use; it is the slowest import of the pipeline
+    import nltk
+
+    if data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+    except LookupError:
+        raise MissingResourceError(
+            f"NLTK resource '{name}' is not installed in {data_dir} or the default NLTK data folders. "
+            f"Run `python main.py prepare-resources --data-dir {data_dir}` on a machine with network access "
+            f"and copy the folder over, or point NLTK_DATA at an existing copy."
+        ) from None
+    _found_resources.add(name)
+
+
+def prepare_resources(data_dir: str = DEFAULT_NLTK_DATA_DIR):
+    """
+    Download every NLTK resource used by Preprocessing into the data folder. Run once per machine.
+    """
+    import nltk
+
+    os.makedirs(data_dir, exist_ok=True)
+    for name in NLTK_RESOURCES:
+        if not nltk.download(name, download_dir=data_dir, quiet=True, raise_on_error=True):
+            raise MissingResourceError(f"Could not download NLTK resource '{name}' into {data_dir}")
+        _found_resources.discard(name)
 
-# Ensure to download necessary NLTK resources
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('punkt_tab')
 
 class Preprocessing:
-    def __init__(self):
-        # Define stopwords
-        self.stop_words = set(stopwords.words('english'))
+    def __init__(self, data_dir: str = DEFAULT_NLTK_DATA_DIR):
+        # NLTK resources are resolved from data_dir on first use
+        self.data_dir = data_dir
+        self._stop_words = None
+
+    @property
+    def stop_words(self) -> set:
+        """
+        English stop words, loaded on first use.
+        """
+        if self._stop_words is None:
+            ensure_resource('stopwords', self.data_dir)
+            from nltk.corpus import stopwords
+            self._stop_words = set(stopwords.words('english'))
+        return self._stop_words
 
     def sentence_splitter(self, text: str) -> List[str]:
         """
         Split the text into sentences.
         """
+        ensure_resource('punkt_tab', self.data_dir)
+        from nltk.tokenize import sent_tokenize
         return sent_tokenize(text)
 
     def tokenize_sentence(self, sentence: str) -> List[str]:
         """
         Tokenize a sentence into words.
         """
+        ensure_resource('punkt_tab', self.data_dir)
+        from nltk.tokenize import word_tokenize
         return word_tokenize(sentence)
 
     def remove_stop_words(self, tokens: List[str]) -> List[str]:
@@ -31,20 +96,42 @@ class Preprocessing:
         """
         return [word for word in tokens if word.lower() not in self.stop_words]
 
-    def preprocess_section(self, section: List[str]) -> List[List[str]]:
+    @timed_stage('preprocess_section')
+    def split_section(self, section: List[str]) -> Tuple[List[str], List[List[str]]]:
         """
-        Preprocesses a section by splitting into sentences, tokenizing each sentence, and removing stop words.
-        Returns a list of tokenized sentences with stop words removed.
+        Splits a section into sentences and tokenizes each sentence with stop words removed.
+        Returns the sentences and their token lists, aligned one to one.
         """
-        preprocessed_sentences = []
+        sentences = []
+        tokenized_sentences = []
         for paragraph in section:
-            sentences = self.sentence_splitter(paragraph)
-            for sentence in sentences:
+            for sentence in self.sentence_splitter(paragraph):
                 tokens = self.tokenize_sentence(sentence)
                 filtered_tokens = self.remove_stop_words(tokens)
                 if filtered_tokens:  # Avoid adding empty sentences
-                    preprocessed_sentences.append(filtered_tokens)
-        return preprocessed_sentences
+                    sentences.append(sentence)
+                    tokenized_sentences.append(filtered_tokens)
+        record(preprocessed_sentences=len(sentences))
+        return sentences, tokenized_sentences
+
+    def preprocess_section(self, section: List[str]) -> List[List[str]]:
+        """
+        Preprocesses a section by splitting into sentences, tokenizing each sentence, and removing stop words.
+        Returns a list of tokenized sentences with stop words removed.
+        """
+        return self.split_section(section)[1]
+
+    def split_sections(self, sections: Dict[str, List[str]]) -> Tuple[Dict[str, List[str]], Dict[str, List[List[str]]]]:
+        """
+        Split all sections except the title into sentences and their token lists.
+        Returns two dictionaries keyed by section name: the sentences, and the aligned tokenized sentences.
+        """
+        sentence_sections = {}
+        token_sections = {}
+        for section_name, content in sections.items():
+            if section_name != 'title':
+                sentence_sections[section_name], token_sections[section_name] = self.split_section(content)
+        return sentence_sections, token_sections
 
     def preprocess_sections(self, sections: Dict[str, List[str]]) -> Dict[str, List[List[str]]]:
         """
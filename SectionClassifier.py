@@ -0,0 +1,111 @@
+import re
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from HeadingsKeywords import issue_kw, rulings_kw
+
+SECTIONS = ['facts', 'issues', 'rulings']
+
+# Score of each section at the start (position 0) and at the end (position 1) of the decision body.
+# Decisions tell the facts first, then state the issues and close with the ruling.
+POSITION_PRIORS = {
+    'facts': (1.0, -1.0),
+    'issues': (-0.5, -0.5),
+    'rulings': (-1.0, 1.0),
+}
+
+
+class SectionClassifier:
+    def __init__(self, keyword_groups: Optional[Dict[str, List[str]]] = None,
+                 keyword_weight: float = 1.0, prior_weight: float = 1.0):
+        """
+        Description:
+        Label the paragraphs of a decision as facts, issues or rulings when it has no section headings.
+        Every keyword is compiled into one regular expression so each paragraph is scanned once,
+        the keyword hits are combined with position priors, and the best split into
+        facts -> issues -> rulings (in that order, any section possibly empty) is found in linear time.
+
+        Parameters:
+        - keyword_groups: Dictionary mapping 'issues' and/or 'rulings' to keyword lists.
+                          Defaults to issue_kw and rulings_kw from HeadingsKeywords.
+        - keyword_weight: Score added to a section for every keyword of it found in a paragraph.
+        - prior_weight: Scale of the position priors.
+        """
+        if keyword_groups is None:
+            keyword_groups = {'issues': issue_kw, 'rulings': rulings_kw}
+        self.keyword_weight = keyword_weight
+        self.prior_weight = prior_weight
+
+        # Keyword -> section index; a keyword listed under two sections keeps the first
+        self.keyword_sections = {}
+        for section, keywords in keyword_groups.items():
+            for keyword in keywords:
+                self.keyword_sections.setdefault(keyword.lower(), SECTIONS.index(section))
+
+        # Longest keywords first, so 'guilty beyond reasonable doubt' wins over 'guilt'
+        alternatives = sorted(self.keyword_sections, key=len, reverse=True)
+        self.pattern = re.compile(
+            r'\b(' + '|'.join(re.escape(keyword) for keyword in alternatives) + r')',
+            re.IGNORECASE
+        ) if alternatives else None
+
+    def keyword_hits(self, paragraphs: List[str]) -> np.ndarray:
+        """
+        Count the keywords of each section in each paragraph; returns a (paragraphs x 3) array.
+        """
+        hits = np.zeros((len(paragraphs), len(SECTIONS)))
+        if self.pattern is None:
+            return hits
+        for row, paragraph in enumerate(paragraphs):
+            for keyword in self.pattern.findall(paragraph):
+                hits[row, self.keyword_sections[keyword.lower()]] += 1
+        return hits
+
+    def scores(self, paragraphs: List[str]) -> np.ndarray:
+        """
+        Description:
+        Score every paragraph for every section from its keyword hits and its relative position.
+
+        Parameters:
+        - paragraphs: The paragraphs of the decision body, in order.
+
+        Return:
+        - scores: A (paragraphs x 3) array with one column per section in SECTIONS order.
+        """
+        n = len(paragraphs)
+        positions = (np.arange(n) + 0.5) / n if n else np.zeros(0)
+        start = np.array([POSITION_PRIORS[section][0] for section in SECTIONS])
+        end = np.array([POSITION_PRIORS[section][1] for section in SECTIONS])
+        priors = start + positions[:, np.newaxis] * (end - start)
+        return self.keyword_weight * self.keyword_hits(paragraphs) + self.prior_weight * priors
+
+    def classify(self, paragraphs: List[str]) -> List[str]:
+        """
+        Description:
+        Label paragraphs so that the labels run facts, then issues, then rulings, with the highest total score.
+
+        Parameters:
+        - paragraphs: The paragraphs of the decision body, in order.
+
+        Return:
+        - labels: The section name of every paragraph.
+        """
+        n = len(paragraphs)
+        if n == 0:
+            return []
+        scores = self.scores(paragraphs)
+        # cumulative[k, s]: total score of section s over the first k paragraphs
+        cumulative = np.vstack([np.zeros(len(SECTIONS)), np.cumsum(scores, axis=0)])
+        facts, issues, rulings = cumulative.T
+
+        # Facts are paragraphs [0, b1), issues [b1, b2), rulings [b2, n). For every b2 the best b1 <= b2
+        # is a running maximum, so all splits are compared in one vectorized pass.
+        facts_gain = facts - issues
+        best_facts_end = np.maximum.accumulate(facts_gain)
+        totals = best_facts_end + issues - rulings + rulings[-1]
+        issues_end = int(np.argmax(totals))
+        facts_end = int(np.argmax(facts_gain[:issues_end + 1]))
+
+        return (['facts'] * facts_end + ['issues'] * (issues_end - facts_end)
+                + ['rulings'] * (n - issues_end))
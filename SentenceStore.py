@@ -0,0 +1,144 @@
+import sqlite3
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from LSA import LSA
+from SentenceTable import to_label_codes
+
+DEFAULT_STORE_PATH = 'sentences.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    case_id TEXT PRIMARY KEY,
+    content_key TEXT,
+    sentence_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sentences (
+    case_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    score REAL NOT NULL,
+    sentence TEXT NOT NULL,
+    PRIMARY KEY (case_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_sentences_case_label ON sentences (case_id, label);
+"""
+
+
+class SentenceStore:
+    def __init__(self, db_path: str = DEFAULT_STORE_PATH):
+        """
+        Description:
+        SQLite store of per-sentence LSA results (case, section label, position, score) so that
+        summaries of any length or section split can be produced again without rerunning the pipeline.
+        Several worker processes may write to the same store.
+
+        Parameters:
+        - db_path: Path of the SQLite database file.
+        """
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def save_case(self, case_id: str, result: Dict, content_key: Optional[str] = None):
+        """
+        Description:
+        Replace the stored sentences of a case with a new LSA result.
+
+        Parameters:
+        - case_id: Identifier of the case (its folder name, e.g. 'G.R. No. 190640, January 12, 2011').
+        - result: Structured result of LSA.summarize / LSA.summarize_svd.
+        - content_key: Optional hash of the input and settings the result was computed from.
+        """
+        # Deduplicated results index the kept sentences only; store their original positions
+        positions = result.get('positions')
+        if positions is None:
+            positions = range(len(result['sentences']))
+        rows = [
+            (case_id, int(position), label, float(score), sentence)
+            for position, sentence, label, score in zip(positions, result['sentences'], result['labels'],
+                                                        result['scores'])
+        ]
+        with self.connection:
+            self.connection.execute("DELETE FROM sentences WHERE case_id = ?", (case_id,))
+            self.connection.execute("INSERT OR REPLACE INTO cases VALUES (?, ?, ?)",
+                                    (case_id, content_key, len(rows)))
+            self.connection.executemany("INSERT INTO sentences VALUES (?, ?, ?, ?, ?)", rows)
+
+    def has_case(self, case_id: str) -> bool:
+        """
+        Whether the case is stored.
+        """
+        return self.connection.execute("SELECT 1 FROM cases WHERE case_id = ?", (case_id,)).fetchone() is not None
+
+    def content_key(self, case_id: str) -> Optional[str]:
+        """
+        Return the content key stored with a case, or None if the case is not stored.
+        """
+        row = self.connection.execute("SELECT content_key FROM cases WHERE case_id = ?", (case_id,)).fetchone()
+        return row[0] if row else None
+
+    def case_ids(self) -> List[str]:
+        """
+        Return the identifiers of every stored case.
+        """
+        return [row[0] for row in self.connection.execute("SELECT case_id FROM cases ORDER BY case_id")]
+
+    def load_case(self, case_id: str, labels: Optional[List[str]] = None) -> Dict:
+        """
+        Description:
+        Read the stored sentences of a case in original order.
+
+        Parameters:
+        - case_id: Identifier of the case.
+        - labels: Optional section labels to restrict the rows to.
+
+        Return:
+        - case: Dictionary with 'sentences', 'labels' and 'scores' (a NumPy array).
+        """
+        query = "SELECT sentence, label, score FROM sentences WHERE case_id = ?"
+        params = [case_id]
+        if labels:
+            query += f" AND label IN ({', '.join('?' * len(labels))})"
+            params += labels
+        rows = self.connection.execute(query + " ORDER BY position", params).fetchall()
+        if not rows and not self.has_case(case_id):
+            raise KeyError(f"Case '{case_id}' is not in the sentence store {self.db_path}")
+        return {
+            'sentences': [row[0] for row in rows],
+            'labels': [row[1] for row in rows],
+            'scores': np.array([row[2] for row in rows], dtype=np.float32),
+        }
+
+    def query_summary(self, case_id: str, total_sentences: Optional[int] = None,
+                      facts_pct: float = 0.5, issues_pct: float = 0.05, ruling_pct: float = 0.45) -> Dict:
+        """
+        Description:
+        Build a summary of a stored case from its stored scores, with the same selection rules as LSA.
+
+        Parameters:
+        - case_id: Identifier of the case.
+        - total_sentences: Target number of sentences. By default the number of stored sentences times
+                           the sum of the section percentages, as in LSA.
+        - facts_pct: Share of the summary given to the facts section.
+        - issues_pct: Share of the summary given to the issues section.
+        - ruling_pct: Share of the summary given to the rulings section.
+
+        Return:
+        - result: Structured result with 'sentences', 'labels', 'scores', 'indices', 'selected' and
+                  the formatted 'summary' text.
+        """
+        case = self.load_case(case_id)
+        lsa = LSA({}, facts_pct=facts_pct, issues_pct=issues_pct, ruling_pct=ruling_pct)
+        selected = lsa.select_by_scores(case['scores'], to_label_codes(case['labels']), total_sentences)
+        result = dict(case)
+        result['selected'] = selected
+        result['indices'] = sorted(i for indices in selected.values() for i in indices)
+        result['summary'] = lsa.format_summary(result)
+        return result
@@ -0,0 +1,128 @@
+from collections.abc import Sequence
+from typing import List, Dict, Iterator, Optional
+
+import numpy as np
+
+# Label of every code stored in SentenceTable.label_codes
+LABEL_NAMES = ('title', 'facts', 'issues', 'rulings')
+LABEL_CODES = {label: code for code, label in enumerate(LABEL_NAMES)}
+
+
+def to_label_codes(labels) -> np.ndarray:
+    """
+    Convert a sequence of label names to an int8 array of label codes.
+    """
+    return np.fromiter((LABEL_CODES[label] for label in labels), dtype=np.int8, count=len(labels))
+
+
+def top_k(scores: np.ndarray, label_codes: np.ndarray, limits: Dict[str, int]) -> Dict[str, List[int]]:
+    """
+    Description:
+    Select the highest scoring sentences of each label without sorting: np.argpartition finds each
+    label's k-th best score, everything above it is taken, and ties at the cut go to the earliest sentences.
+
+    Parameters:
+    - scores: The relevance score of every sentence.
+    - label_codes: The label code of every sentence.
+    - limits: Dictionary mapping labels to the number of sentences to select.
+
+    Return:
+    - selected: Dictionary mapping each label of limits to the indices of its selected sentences,
+                in original order.
+    """
+    selected = {}
+    for label, limit in limits.items():
+        positions = np.flatnonzero(label_codes == LABEL_CODES[label])
+        if limit >= len(positions):
+            selected[label] = positions.tolist()
+            continue
+        if limit <= 0:
+            selected[label] = []
+            continue
+        label_scores = scores[positions]
+        cut = label_scores[np.argpartition(-label_scores, limit - 1)[limit - 1]]
+        keep = label_scores > cut
+        keep[np.flatnonzero(label_scores == cut)[:limit - np.count_nonzero(keep)]] = True
+        selected[label] = positions[keep].tolist()
+    return selected
+
+
+class SentenceTable(Sequence):
+    def __init__(self, buffer: str, offsets: np.ndarray, label_codes: np.ndarray,
+                 scores: Optional[np.ndarray] = None):
+        """
+        Description:
+        Columnar table of the sentences of a case: one joined text buffer, int32 offsets into it,
+        int8 label codes (see LABEL_NAMES) and, once scored, float32 scores. Behaves as a read-only
+        sequence of sentence strings, so it can be used wherever a list of sentences is expected.
+
+        Parameters:
+        - buffer: All sentences joined together.
+        - offsets: Array of len(sentences) + 1 positions in the buffer; sentence i is buffer[offsets[i]:offsets[i + 1]].
+        - label_codes: The label code of every sentence.
+        - scores: Optional relevance score of every sentence.
+        """
+        self.buffer = buffer
+        self.offsets = offsets
+        self.label_codes = label_codes
+        self.scores = scores
+
+    @classmethod
+    def from_sections(cls, text_dict: Dict[str, List[str]]) -> 'SentenceTable':
+        """
+        Build a table from a dictionary mapping labels to sentences, keeping the dictionary order.
+        """
+        sentences = [sentence for sentence_list in text_dict.values() for sentence in sentence_list]
+        counts = [len(sentence_list) for sentence_list in text_dict.values()]
+        codes = np.repeat(np.array([LABEL_CODES[label] for label in text_dict], dtype=np.int8), counts)
+        return cls.from_rows(sentences, codes)
+
+    @classmethod
+    def from_rows(cls, sentences: List[str], labels, scores=None) -> 'SentenceTable':
+        """
+        Build a table from parallel sentences and labels (label names or codes), with optional scores.
+        """
+        if len(labels) and isinstance(labels[0], str):
+            labels = to_label_codes(labels)
+        offsets = np.zeros(len(sentences) + 1, dtype=np.int32)
+        np.cumsum([len(sentence) for sentence in sentences], out=offsets[1:])
+        return cls(
+            ''.join(sentences),
+            offsets,
+            np.asarray(labels, dtype=np.int8),
+            None if scores is None else np.asarray(scores, dtype=np.float32),
+        )
+
+    def take(self, indices) -> 'SentenceTable':
+        """
+        New table of the given rows, in the given order, with their labels and scores.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        return SentenceTable.from_rows(
+            [self[i] for i in indices.tolist()],
+            self.label_codes[indices],
+            None if self.scores is None else self.scores[indices],
+        )
+
+    def __len__(self) -> int:
+        return len(self.label_codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        buffer = self.buffer
+        bounds = self.offsets.tolist()
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            yield buffer[start:end]
+
+    @property
+    def labels(self) -> List[str]:
+        """
+        The label name of every sentence.
+        """
+        return np.array(LABEL_NAMES, dtype=object)[self.label_codes].tolist()
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from BatchSummarizer import get_segmenter, get_vectorizer, preload_pipeline, summarize_text, make_config
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    422: 'Unprocessable Entity',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class BadRequest(Exception):
+    """
+    Raised for requests that cannot be served; carries the HTTP status to answer with.
+    """
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def warm_worker(config: Dict):
+    """
+    Description:
+    Pool initializer: import the pipeline libraries and build the segmenter, preprocessor and
+    vectorizer of a worker process before its first request so requests never pay the setup cost.
+
+    Parameters:
+    - config: The pipeline configuration served by the worker.
+    """
+    preload_pipeline(config)
+    get_segmenter(config['headings_path'])
+    if config['vectorizer_path']:
+        get_vectorizer(config['vectorizer_path'], config['units'])
+
+
+class SummarizationService:
+    def __init__(self, config: Optional[Dict] = None, workers: int = 1, max_pending: Optional[int] = None):
+        """
+        Description:
+        Long-running HTTP/JSON summarization server. Requests are handled with asyncio while the
+        CPU-bound summarization runs in a bounded pool of warm worker processes.
+
+        Endpoints:
+        - GET /health: {"status": "ok", "pending": <summaries in progress>}
+        - POST /summarize: {"text": "..."} -> {"summary": "...", "sections": {...}}
+        - POST /summarize/batch: {"cases": [{"id": "...", "text": "..."}]} -> {"results": [...]}
+
+        Parameters:
+        - config: The pipeline configuration (see BatchSummarizer.make_config).
+        - workers: Number of worker processes.
+        - max_pending: Most summaries queued or running at once; further requests get 503, and batches
+                       with more cases than this get 413. Defaults to four per worker.
+        """
+        self.config = config or make_config()
+        self.workers = max(1, workers)
+        self.max_pending = max_pending or 4 * self.workers
+        self.pending = 0
+        self.executor = None
+
+    def reserve(self, count: int):
+        """
+        Reserve pending slots for count summaries, all or none, so a request is either accepted
+        as a whole or rejected up front.
+        """
+        if count > self.max_pending:
+            raise BadRequest(413, f"At most {self.max_pending} cases are accepted per request, got {count}")
+        if self.pending + count > self.max_pending:
+            raise BadRequest(503, "Too many summaries in progress, retry later")
+        self.pending += count
+
+    async def run_summary(self, text) -> Dict:
+        """
+        Summarize one text in the worker pool, in a slot reserved with reserve(); the slot is released when done.
+        """
+        try:
+            if not isinstance(text, str) or not text.strip():
+                raise BadRequest(400, "'text' must be a non-empty string")
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, summarize_text, text, self.config)
+        except BadRequest:
+            raise
+        except Exception as error:
+            raise BadRequest(422, f"{type(error).__name__}: {error}")
+        finally:
+            self.pending -= 1
+
+    async def summarize(self, text) -> Dict:
+        """
+        Summarize one text in the worker pool.
+        """
+        self.reserve(1)
+        return await self.run_summary(text)
+
+    async def summarize_batch(self, cases) -> Dict:
+        """
+        Summarize several texts concurrently. The whole batch is admitted or rejected at once;
+        once admitted, its cases queue in the pool and failures are reported per case.
+        """
+        if not isinstance(cases, list):
+            raise BadRequest(400, "'cases' must be a list of {'id', 'text'} objects")
+        self.reserve(len(cases))
+
+        async def run(index, case):
+            case_id = case.get('id', index) if isinstance(case, dict) else index
+            try:
+                text = case.get('text') if isinstance(case, dict) else None
+                return {'id': case_id, 'ok': True, **(await self.run_summary(text))}
+            except BadRequest as error:
+                return {'id': case_id, 'ok': False, 'status': error.status, 'error': str(error)}
+
+        return {'results': await asyncio.gather(*(run(index, case) for index, case in enumerate(cases)))}
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        """
+        Route a request to its endpoint and return the status and JSON payload.
+        """
+        routes = {
+            '/health': 'GET',
+            '/summarize': 'POST',
+            '/summarize/batch': 'POST',
+        }
+        path = path.split('?', 1)[0]
+        if path not in routes:
+            raise BadRequest(404, f"No endpoint {path}")
+        if method != routes[path]:
+            raise BadRequest(405, f"{path} only accepts {routes[path]}")
+        if path == '/health':
+            return 200, {'status': 'ok', 'pending': self.pending, 'workers': self.workers}
+
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError as error:
+            raise BadRequest(400, f"Invalid JSON: {error}")
+        if not isinstance(request, dict):
+            raise BadRequest(400, "Request body must be a JSON object")
+
+        if path == '/summarize':
+            return 200, await self.summarize(request.get('text'))
+        return 200, await self.summarize_batch(request.get('cases'))
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve one HTTP/1.1 request per connection.
+        """
+        try:
+            try:
+                request_line = (await reader.readline()).decode('latin-1').strip()
+                method, path, _ = request_line.split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    raise BadRequest(413, f"Request body larger than {MAX_BODY_BYTES} bytes")
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self.dispatch(method.upper(), path, body)
+            except BadRequest as error:
+                status, payload = error.status, {'error': str(error)}
+            except (ValueError, asyncio.IncompleteReadError):
+                status, payload = 400, {'error': "Malformed HTTP request"}
+            except Exception as error:
+                status, payload = 500, {'error': f"{type(error).__name__}: {error}"}
+
+            data = json.dumps(payload).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + data
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """
+        Description:
+        Start the worker pool and serve requests until cancelled.
+
+        Parameters:
+        - host: The interface to listen on.
+        - port: The TCP port to listen on.
+        """
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker,
+                                            initargs=(self.config,))
+        # Start every worker now instead of on the first requests
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, os.getpid) for _ in range(self.workers)))
+        try:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"Serving summaries on http://{host}:{port} with {self.workers} workers")
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+    def run(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """
+        Blocking entry point; stops on Ctrl+C.
+        """
+        try:
+            asyncio.run(self.serve(host, port))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+from AtomicFile import write_text
+
+DEFAULT_CACHE_DIR = '.summary_cache'
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Modules whose source takes part in every cache key, so editing the pipeline invalidates old summaries
+PIPELINE_MODULES = ['PartSegmentation.py', 'HeadingMatcher.py', 'SectionClassifier.py', 'HeadingsKeywords.py',
+                    'Preprocessing.py', 'NearDuplicates.py', 'SentenceTable.py', 'LSA.py', 'BatchSVD.py',
+                    'BatchSummarizer.py']
+
+_code_version = None
+_file_digests = {}
+
+
+def code_version() -> str:
+    """
+    Description:
+    Hash the source of the pipeline modules, computed once per process.
+
+    Parameters: None
+
+    Return:
+    - version: Hex digest identifying the summarizer code.
+    """
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        for module in PIPELINE_MODULES:
+            with open(os.path.join(base_dir, module), 'rb') as file:
+                digest.update(file.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def file_digest(path: str) -> str:
+    """
+    Description:
+    Hash a file's contents, reusing the digest while its size and modification time are unchanged.
+
+    Parameters:
+    - path: The file to hash.
+
+    Return:
+    - digest: Hex digest of the file contents.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _file_digests:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        _file_digests[key] = digest.hexdigest()
+    return _file_digests[key]
+
+
+class SummaryCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        """
+        Description:
+        On-disk cache of generated summaries keyed by a hash of the input text and the summarizer
+        configuration. Entries are plain text files; their modification time records the last use
+        and drives least-recently-used eviction.
+
+        Parameters:
+        - cache_dir: The folder holding the cache entries.
+        - max_bytes: The total size the cache is trimmed back to by evict().
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, text: bytes, config: Dict) -> str:
+        """
+        Description:
+        Build the cache key of one case.
+
+        Parameters:
+        - text: The raw bytes of the court case file.
+        - config: Everything besides the text that affects the summary (section percentages,
+                  heading lists, SVD settings, ...). Must be JSON serializable.
+
+        Return:
+        - key: Hex digest combining the text, the configuration and the code version.
+        """
+        digest = hashlib.sha256()
+        digest.update(code_version().encode('ascii'))
+        digest.update(json.dumps(config, sort_keys=True, default=list).encode('utf-8'))
+        digest.update(text)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.txt')
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached summary for the key, or None on a miss. A hit marks the entry as recently used.
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                summary = file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted by another process in the meantime
+        return summary
+
+    def put(self, key: str, summary: str):
+        """
+        Store a summary. The entry is written to a temporary file and renamed so readers never see partial entries.
+        """
+        write_text(self._entry_path(key), summary)
+
+    def _entries(self) -> Iterable[os.DirEntry]:
+        return [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.txt')]
+
+    def evict(self) -> int:
+        """
+        Description:
+        Delete least recently used entries until the cache fits in max_bytes.
+
+        Parameters: None
+
+        Return:
+        - removed: Number of entries deleted.
+        """
+        entries = []
+        total = 0
+        for entry in self._entries():
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
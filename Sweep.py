@@ -0,0 +1,195 @@
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from AtomicFile import atomic_open
+from LSA import LSA
+from PartSegmentation import PartSegmentation
+from Benchmark import evaluate_summary, HUMAN_SUMMARY_NAME
+from BatchSummarizer import build_lsa, find_case_folders, make_config, case_id, CASE_FILE_NAME
+
+DEFAULT_SWEEP_REPORT_PATH = 'sweep_report.json'
+METRICS = ('rouge1', 'rouge2', 'rougeL')
+
+# Scored cases of every threshold, set once per evaluation worker by _init_evaluator
+_scored = None
+
+
+def make_grid(facts_pcts: List[float], issues_pcts: List[float], ruling_pcts: List[float]) -> List[Dict]:
+    """
+    Every combination of the section percentages, as LSA keyword arguments.
+    """
+    return [
+        {'facts_pct': facts_pct, 'issues_pct': issues_pct, 'ruling_pct': ruling_pct}
+        for facts_pct, issues_pct, ruling_pct in itertools.product(facts_pcts, issues_pcts, ruling_pcts)
+    ]
+
+
+def score_case(folder_path: str, thresholds: List[int], config: Dict) -> Dict:
+    """
+    Description:
+    Segment one case at every heading threshold and score its sentences with LSA. Thresholds that
+    segment the case identically share one LSA run. The scores do not depend on the section
+    percentages, so every point of the grid is evaluated from them by re-selection alone.
+
+    Parameters:
+    - folder_path: The case folder containing the court case and its human summary.
+    - thresholds: The heading similarity thresholds to segment with.
+    - config: The batch configuration (see BatchSummarizer.make_config). The cache is not used.
+
+    Return:
+    - scored: Dictionary with the case id, its human summary, and per threshold the SentenceTable
+              of the case and the sentence scores.
+    """
+    with open(os.path.join(folder_path, CASE_FILE_NAME), 'r', encoding='utf-8') as file:
+        text = file.read()
+    with open(os.path.join(folder_path, HUMAN_SUMMARY_NAME), 'r', encoding='utf-8') as file:
+        human_summary = file.read()
+
+    segmentations = {}
+    by_segmentation = {}
+    for threshold in thresholds:
+        sections = PartSegmentation(config['headings_path'], threshold).segment_by_headings(text)
+        key = json.dumps(sections, sort_keys=True)
+        if key not in by_segmentation:
+            lsa = build_lsa(sections, config)
+            sentences, _, term_matrix = lsa.build_matrix()
+            scores = lsa.score_sentences(lsa.apply_svd(term_matrix)).astype(np.float32)
+            by_segmentation[key] = {'sentences': sentences, 'scores': scores}
+        segmentations[threshold] = by_segmentation[key]
+
+    return {
+        'case': case_id(folder_path),
+        'human_summary': human_summary,
+        'segmentations': segmentations,
+        'lsa_runs': len(by_segmentation),
+    }
+
+
+def evaluate_point(scored_cases: List[Dict], threshold: int, percentages: Dict) -> Dict:
+    """
+    Description:
+    Select the summaries of one grid point from the cached scores and score them with ROUGE.
+
+    Parameters:
+    - scored_cases: Results of score_case.
+    - threshold: The heading threshold of the point.
+    - percentages: The facts_pct, issues_pct and ruling_pct of the point.
+
+    Return:
+    - point: Dictionary with the settings, the mean ROUGE f1 over the cases (whole summary and
+             per section) and the mean summary length in sentences.
+    """
+    selector = LSA({}, **percentages)
+    totals = {section: {metric: 0.0 for metric in METRICS} for section in ('all', 'facts', 'issues', 'rulings')}
+    lengths = 0
+    for case in scored_cases:
+        segmentation = case['segmentations'][threshold]
+        selected = selector.select_by_scores(segmentation['scores'], segmentation['sentences'].label_codes)
+        summary = selector.format_summary({'sentences': segmentation['sentences'], 'selected': selected})
+        scores = evaluate_summary(summary, case['human_summary'])
+        for section, section_totals in totals.items():
+            for metric in METRICS:
+                section_totals[metric] += scores[section][metric]['f1']
+        lengths += sum(len(indices) for indices in selected.values())
+
+    count = max(len(scored_cases), 1)
+    return {
+        'threshold': threshold,
+        **percentages,
+        'rouge_f1': {section: {metric: value / count for metric, value in section_totals.items()}
+                     for section, section_totals in totals.items()},
+        'mean_sentences': lengths / count,
+    }
+
+
+def _init_evaluator(scored_cases: List[Dict]):
+    global _scored
+    _scored = scored_cases
+
+
+def _evaluate_points(points: List) -> List[Dict]:
+    return [evaluate_point(_scored, threshold, percentages) for threshold, percentages in points]
+
+
+def run_sweep(input_root: str, grid: List[Dict], thresholds: List[int], config: Optional[Dict] = None,
+              workers: int = 1, metric: str = 'rougeL', report_file: Optional[str] = None) -> Dict:
+    """
+    Description:
+    Evaluate every combination of heading threshold and section percentages against the human summaries.
+    Each case is segmented once per threshold and scored by LSA once per distinct segmentation;
+    the grid is then evaluated in parallel purely by re-selecting sentences from those scores.
+
+    Parameters:
+    - input_root: The folder holding one sub-folder per court case. Cases without a human summary are skipped.
+    - grid: The section percentages to try (see make_grid).
+    - thresholds: The heading similarity thresholds to try.
+    - config: The batch configuration (see BatchSummarizer.make_config).
+    - workers: Number of worker processes.
+    - metric: The ROUGE metric ('rouge1', 'rouge2' or 'rougeL') of the whole summary the points are ranked by.
+    - report_file: Optional path of the JSON report to write.
+
+    Return:
+    - report: Dictionary with the case count, LSA runs, timings and the points ranked best first.
+    """
+    config = config or make_config()
+    folders = [folder_path for folder_path in find_case_folders(input_root)
+               if os.path.isfile(os.path.join(folder_path, HUMAN_SUMMARY_NAME))]
+    points = [(threshold, percentages) for threshold in thresholds for percentages in grid]
+    start = time.perf_counter()
+
+    if workers <= 1:
+        scored_cases = [score_case(folder_path, thresholds, config) for folder_path in folders]
+        scored_at = time.perf_counter()
+        _init_evaluator(scored_cases)
+        results = _evaluate_points(points)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            scored_cases = list(executor.map(score_case, folders, [thresholds] * len(folders),
+                                             [config] * len(folders)))
+        scored_at = time.perf_counter()
+        # The scores are sent to each worker once; tasks only carry their grid points
+        chunk_size = max(1, len(points) // (workers * 4))
+        chunks = [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_evaluator,
+                                 initargs=(scored_cases,)) as executor:
+            results = [point for chunk in executor.map(_evaluate_points, chunks) for point in chunk]
+    elapsed = time.perf_counter() - start
+
+    ranked = sorted(results, key=lambda point: point['rouge_f1']['all'][metric], reverse=True)
+    report = {
+        'config': {key: config[key] for key in ('lsa_options', 'units', 'vectorizer_path', 'headings_path')},
+        'metric': metric,
+        'cases': len(scored_cases),
+        'points': len(points),
+        'lsa_runs': sum(case['lsa_runs'] for case in scored_cases),
+        'scoring_seconds': scored_at - start,
+        'evaluation_seconds': elapsed - (scored_at - start),
+        'points_per_sec': len(points) / (elapsed - (scored_at - start)) if elapsed > scored_at - start else 0.0,
+        'ranked': ranked,
+    }
+
+    if report_file:
+        with atomic_open(report_file) as out_file:
+            json.dump(report, out_file, indent=2)
+    return report
+
+
+def format_table(ranked: List[Dict], top: Optional[int] = None) -> str:
+    """
+    Format ranked sweep points as a text table, best first.
+    """
+    header = (f"{'rank':>4}  {'thresh':>6}  {'facts':>5}  {'issues':>6}  {'rulings':>7}  "
+              f"{'rouge1':>6}  {'rouge2':>6}  {'rougeL':>6}  {'sents':>5}")
+    lines = [header, '-' * len(header)]
+    for rank, point in enumerate(ranked[:top], start=1):
+        scores = point['rouge_f1']['all']
+        lines.append(f"{rank:>4}  {point['threshold']:>6}  {point['facts_pct']:>5.2f}  {point['issues_pct']:>6.2f}  "
+                     f"{point['ruling_pct']:>7.2f}  {scores['rouge1']:>6.4f}  {scores['rouge2']:>6.4f}  "
+                     f"{scores['rougeL']:>6.4f}  {point['mean_sentences']:>5.1f}")
+    return "\n".join(lines)
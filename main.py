@@ -1,50 +1,406 @@
+import argparse
 import os
-import numpy as np
-from PartSegmentation import PartSegmentation
-from Preprocessing import Preprocessing
+import time
+
+from Benchmark import run_benchmark, measure_import_time, DEFAULT_REPORT_PATH, DEFAULT_IMPORT_BUDGET_MS
+from BatchSummarizer import (run_batch, make_config, find_case_folders, get_index, get_segmenter, get_preprocessor,
+                             text_vector, DEFAULT_OUTPUT_NAME, CASE_FILE_NAME)
+from CaseIndex import CaseIndex, DEFAULT_INDEX_PATH
+from CaseWatcher import CaseWatcher, DEFAULT_CHECKPOINT_PATH
+from CorpusPack import pack_corpus, DEFAULT_PACK_PATH
+from CorpusVectorizer import fit_corpus_vectorizer, save_vectorizer, DEFAULT_VECTORIZER_PATH
 from LSA import LSA
+from NearDuplicates import DEFAULT_JACCARD_THRESHOLD
+from Preprocessing import prepare_resources, DEFAULT_NLTK_DATA_DIR
+from SentenceStore import SentenceStore, DEFAULT_STORE_PATH
+from SummarizationService import SummarizationService, DEFAULT_HOST, DEFAULT_PORT
+from Sweep import run_sweep, make_grid, format_table, DEFAULT_SWEEP_REPORT_PATH
+from SummaryCache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+
+
+def add_pipeline_arguments(parser: argparse.ArgumentParser, with_defaults: bool = True):
+    """
+    Add the options shared by every command that runs the summarization pipeline.
+    Sub-commands pass with_defaults=False so they do not overwrite values given before the command name.
+    """
+    def default(value):
+        return value if with_defaults else argparse.SUPPRESS
+
+    parser.add_argument('--input-root', default=default("Court_Cases"),
+                        help="Folder containing one sub-folder per court case (default: Court_Cases)")
+    parser.add_argument('--output-name', default=default(DEFAULT_OUTPUT_NAME),
+                        help=f"Summary file name written inside each case folder (default: {DEFAULT_OUTPUT_NAME})")
+    parser.add_argument('--units', choices=('sentences', 'lines'), default=default('sentences'),
+                        help="Summarize NLTK sentences tokenized once by Preprocessing, "
+                             "or raw lines tokenized by the vectorizer (default: sentences)")
+    parser.add_argument('--headings', default=default(None),
+                        help="Heading configuration (JSON) to segment with (default: headings.json)")
+
+    svd_group = parser.add_argument_group("LSA scoring")
+    svd_group.add_argument('--components', type=int, default=default(1),
+                           help="Number of latent topics kept by the SVD (default: 1)")
+    svd_group.add_argument('--svd-algorithm', choices=LSA.SVD_ALGORITHMS, default=default('randomized'),
+                           help="SVD solver (default: randomized)")
+    svd_group.add_argument('--svd-iter', type=int, default=default(5),
+                           help="Power iterations of the randomized solver (default: 5)")
+    svd_group.add_argument('--seed', type=int, default=default(0),
+                           help="Seed of the SVD solver (default: 0)")
+    svd_group.add_argument('--scoring', choices=LSA.SCORING_METHODS, default=default('sum'),
+                           help="Sentence scoring: sum of topic weights, Steinberger-Jezek length, "
+                                "or Gong-Liu per-topic pick (default: sum)")
+    svd_group.add_argument('--dedupe', type=float, nargs='?', const=DEFAULT_JACCARD_THRESHOLD, default=default(None),
+                           metavar='JACCARD',
+                           help="Collapse near-duplicate sentences (quoted passages) onto their first occurrence "
+                                "before building the term matrix; the optional value is the minimum word 3-gram "
+                                f"Jaccard similarity (default when given: {DEFAULT_JACCARD_THRESHOLD})")
+    svd_group.add_argument('--vectorizer', default=default(None),
+                           help="Corpus TF-IDF vectorizer built by fit-vectorizer. "
+                                "Without it a vectorizer is fitted per case.")
+
+
+def float_list(value: str) -> list:
+    return [float(item) for item in value.split(',') if item.strip()]
+
+
+def int_list(value: str) -> list:
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Summarize every court case under the input folder.")
+    add_pipeline_arguments(parser)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: number of CPUs)")
+
+    parser.add_argument('--svd-batch-size', type=int, default=1,
+                        help="Compute the SVDs of this many cases together in one batched power iteration; "
+                             "it matches the ARPACK solver, so it requires --svd-algorithm arpack "
+                             "(single component only; default: 1, one TruncatedSVD per case)")
+
+    parser.add_argument('--store', default=None,
+                        help="SQLite sentence store receiving every sentence's section, position and LSA score, "
+                             "for re-querying summaries with the query command")
+
+    parser.add_argument('--index', default=None,
+                        help="Similarity index receiving a document vector of every case, for finding related "
+                             "decisions with the similar command (requires --vectorizer)")
+
+    parser.add_argument('--corpus-pack', default=None,
+                        help="Memory-mapped corpus pack built by pack-corpus to read case texts from; "
+                             "cases changed since packing are read from their files")
+
+    cache_group = parser.add_argument_group("summary cache")
+    cache_group.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                             help=f"Folder of the summary cache (default: {DEFAULT_CACHE_DIR})")
+    cache_group.add_argument('--cache-max-mb', type=float, default=DEFAULT_CACHE_MAX_BYTES / (1024 * 1024),
+                             help="Least recently used summaries are evicted beyond this size "
+                                  f"(default: {DEFAULT_CACHE_MAX_BYTES // (1024 * 1024)})")
+    cache_group.add_argument('--no-cache', action='store_true',
+                             help="Do not read or write the summary cache")
+    cache_group.add_argument('--force', action='store_true',
+                             help="Recompute every summary even if the cache has it")
+
+    metrics_group = parser.add_argument_group("instrumentation")
+    metrics_group.add_argument('--metrics-jsonl', default=None,
+                               help="Append per-case stage durations, sentence counts and matrix sizes "
+                                    "to this JSON Lines file")
+    metrics_group.add_argument('--metrics-prom', default=None,
+                               help="Write the aggregated metrics of the run to this Prometheus text file")
+
+    subparsers = parser.add_subparsers(dest='command')
+    fit_parser = subparsers.add_parser('fit-vectorizer',
+                                       help="Fit one TF-IDF vectorizer over the whole corpus and save it")
+    fit_parser.add_argument('--input-root', default=argparse.SUPPRESS,
+                            help="Folder containing one sub-folder per court case (default: Court_Cases)")
+    fit_parser.add_argument('--units', choices=('sentences', 'lines'), default=argparse.SUPPRESS,
+                            help="Units the vectorizer will be used with; it is fitted on the same units "
+                                 "(default: sentences)")
+    fit_parser.add_argument('--output', default=DEFAULT_VECTORIZER_PATH,
+                            help=f"Where to save the fitted vectorizer (default: {DEFAULT_VECTORIZER_PATH})")
+
+    pack_parser = subparsers.add_parser('pack-corpus',
+                                        help="Pack every case text and its line index into one memory-mapped file")
+    pack_parser.add_argument('--input-root', default=argparse.SUPPRESS,
+                             help="Folder containing one sub-folder per court case (default: Court_Cases)")
+    pack_parser.add_argument('--output', default=DEFAULT_PACK_PATH,
+                             help=f"Where to write the corpus pack (default: {DEFAULT_PACK_PATH})")
+
+    resources_parser = subparsers.add_parser('prepare-resources',
+                                             help="Download the NLTK data used by Preprocessing into a local folder")
+    resources_parser.add_argument('--data-dir', default=DEFAULT_NLTK_DATA_DIR,
+                                  help=f"Folder to download the NLTK data into (default: {DEFAULT_NLTK_DATA_DIR})")
+
+    benchmark_parser = subparsers.add_parser('benchmark',
+                                             help="Score summaries against the human summaries with ROUGE "
+                                                  "and time every pipeline stage")
+    add_pipeline_arguments(benchmark_parser, with_defaults=False)
+    benchmark_parser.add_argument('--report', default=DEFAULT_REPORT_PATH,
+                                  help=f"Where to write the JSON report (default: {DEFAULT_REPORT_PATH})")
+
+    import_parser = subparsers.add_parser('import-time',
+                                          help="Check that starting the command line stays within an import-time "
+                                               "budget and does not load scikit-learn, pandas or NLTK")
+    import_parser.add_argument('--budget-ms', type=float, default=DEFAULT_IMPORT_BUDGET_MS,
+                               help=f"Largest acceptable import time in milliseconds "
+                                    f"(default: {DEFAULT_IMPORT_BUDGET_MS:g})")
+    import_parser.add_argument('--repeats', type=int, default=3,
+                               help="Number of fresh interpreters to time; the fastest counts (default: 3)")
+
+    sweep_parser = subparsers.add_parser('sweep',
+                                         help="Rank section percentages and heading thresholds by ROUGE "
+                                              "against the human summaries")
+    add_pipeline_arguments(sweep_parser, with_defaults=False)
+    sweep_parser.add_argument('--facts-pct', type=float_list, default=[0.4, 0.5, 0.6],
+                              help="Comma-separated facts percentages to try (default: 0.4,0.5,0.6)")
+    sweep_parser.add_argument('--issues-pct', type=float_list, default=[0.05, 0.1],
+                              help="Comma-separated issues percentages to try (default: 0.05,0.1)")
+    sweep_parser.add_argument('--rulings-pct', type=float_list, default=[0.35, 0.45, 0.55],
+                              help="Comma-separated rulings percentages to try (default: 0.35,0.45,0.55)")
+    sweep_parser.add_argument('--thresholds', type=int_list, default=[70, 75, 80],
+                              help="Comma-separated heading similarity thresholds to try (default: 70,75,80)")
+    sweep_parser.add_argument('--metric', choices=('rouge1', 'rouge2', 'rougeL'), default='rougeL',
+                              help="ROUGE f1 of the whole summary to rank by (default: rougeL)")
+    sweep_parser.add_argument('--top', type=int, default=20, help="Rows of the ranked table to print (default: 20)")
+    sweep_parser.add_argument('--report', default=DEFAULT_SWEEP_REPORT_PATH,
+                              help=f"Where to write the JSON report (default: {DEFAULT_SWEEP_REPORT_PATH})")
+    sweep_parser.add_argument('--workers', type=int, default=argparse.SUPPRESS,
+                              help="Number of worker processes (default: number of CPUs)")
+
+    watch_parser = subparsers.add_parser('watch',
+                                         help="Summarize new and modified cases as they land in the input folder")
+    add_pipeline_arguments(watch_parser, with_defaults=False)
+    watch_parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH,
+                              help=f"File recording the cases already summarized (default: {DEFAULT_CHECKPOINT_PATH})")
+    watch_parser.add_argument('--debounce', type=float, default=2.0,
+                              help="Seconds a court case file must stay unchanged before it is summarized (default: 2)")
+    watch_parser.add_argument('--poll', action='store_true',
+                              help="Poll the input folder instead of using inotify")
+    watch_parser.add_argument('--poll-interval', type=float, default=5.0,
+                              help="Seconds between scans when polling (default: 5)")
+    watch_parser.add_argument('--workers', type=int, default=argparse.SUPPRESS,
+                              help="Number of worker processes (default: number of CPUs)")
+    watch_parser.add_argument('--index', default=argparse.SUPPRESS,
+                              help="Similarity index kept up to date with every summarized case (requires --vectorizer)")
+
+    serve_parser = subparsers.add_parser('serve',
+                                         help="Run a local HTTP/JSON summarization service with warm workers")
+    add_pipeline_arguments(serve_parser, with_defaults=False)
+    serve_parser.add_argument('--host', default=DEFAULT_HOST, help=f"Interface to listen on (default: {DEFAULT_HOST})")
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    serve_parser.add_argument('--workers', type=int, default=argparse.SUPPRESS,
+                              help="Number of worker processes (default: number of CPUs)")
+    serve_parser.add_argument('--max-pending', type=int, default=None,
+                              help="Most summaries queued or running at once before answering 503, "
+                                   "and the largest accepted batch (default: four per worker)")
+
+    query_parser = subparsers.add_parser('query',
+                                         help="Print a summary of any length from the scores in a sentence store")
+    query_parser.add_argument('case', help="Case folder name, e.g. 'G.R. No. 190640, January 12, 2011'")
+    query_parser.add_argument('--store', default=argparse.SUPPRESS,
+                              help=f"Sentence store written by --store (default: {DEFAULT_STORE_PATH})")
+    query_parser.add_argument('--sentences', type=int, default=None,
+                              help="Target number of sentences (default: as many as the section percentages give)")
+    query_parser.add_argument('--facts-pct', type=float, default=0.5, help="Share of facts sentences (default: 0.5)")
+    query_parser.add_argument('--issues-pct', type=float, default=0.05, help="Share of issues sentences (default: 0.05)")
+    query_parser.add_argument('--rulings-pct', type=float, default=0.45,
+                              help="Share of rulings sentences (default: 0.45)")
+
+    similar_parser = subparsers.add_parser('similar',
+                                           help="List the indexed decisions most similar to an indexed case "
+                                                "or to a new court case file")
+    add_pipeline_arguments(similar_parser, with_defaults=False)
+    similar_parser.add_argument('case', nargs='?', default=None,
+                                help="Indexed case folder name or G.R. number, e.g. 'G.R. No. 190640' or 190640")
+    similar_parser.add_argument('--file', default=None,
+                                help="Court case text file to compare instead of an indexed case; it is run through "
+                                     "the pipeline with the same --vectorizer the index was built with")
+    similar_parser.add_argument('--index', default=argparse.SUPPRESS,
+                                help=f"Similarity index written by --index (default: {DEFAULT_INDEX_PATH})")
+    similar_parser.add_argument('--top', type=int, default=10, help="Number of decisions to list (default: 10)")
+    return parser
+
+
+def lsa_options_from_args(args) -> dict:
+    return {
+        'n_components': args.components,
+        'algorithm': args.svd_algorithm,
+        'n_iter': args.svd_iter,
+        'random_state': args.seed,
+        'scoring': args.scoring,
+        'dedupe_threshold': args.dedupe,
+    }
+
+
+def fit_vectorizer(args):
+    case_files = [os.path.join(folder_path, CASE_FILE_NAME) for folder_path in find_case_folders(args.input_root)]
+    if args.units == 'sentences':
+        vectorizer = fit_corpus_vectorizer(case_files, 'sentences', get_segmenter(args.headings), get_preprocessor())
+    else:
+        vectorizer = fit_corpus_vectorizer(case_files, 'lines')
+    save_vectorizer(vectorizer, args.units, args.output)
+    print(f"Fitted vocabulary of {len(vectorizer.vocabulary_)} terms over the {args.units} of {len(case_files)} "
+          f"cases and saved it to {args.output}")
+    return 0
+
+
+def pack(args):
+    case_files = [os.path.join(folder_path, CASE_FILE_NAME) for folder_path in find_case_folders(args.input_root)]
+    summary = pack_corpus(case_files, args.output)
+    print(f"Packed {summary['cases']} cases ({summary['lines']} lines, {summary['bytes']} bytes) into {args.output}")
+    return 0
+
+
+def sweep(args):
+    grid = make_grid(args.facts_pct, args.issues_pct, args.rulings_pct)
+    report = run_sweep(args.input_root, grid, args.thresholds, pipeline_config_from_args(args), args.workers,
+                       args.metric, args.report)
+    print(format_table(report['ranked'], args.top))
+    print(f"{report['points']} points over {report['cases']} cases ({report['lsa_runs']} LSA runs): "
+          f"scoring {report['scoring_seconds']:.2f}s, evaluation {report['evaluation_seconds']:.2f}s "
+          f"- {report['points_per_sec']:.1f} points/sec")
+    return 0
+
+
+def pipeline_config_from_args(args) -> dict:
+    return make_config(
+        output_name=args.output_name,
+        lsa_options=lsa_options_from_args(args),
+        vectorizer_path=args.vectorizer,
+        units=args.units,
+        headings_path=args.headings,
+    )
+
+
+def benchmark(args):
+    report = run_benchmark(args.input_root, pipeline_config_from_args(args), args.report)
+
+    for section, scores in report['rouge_f1'].items():
+        print(f"{section:>8}: " + "  ".join(f"{metric} {value:.4f}" for metric, value in scores.items()))
+    print("  stages: " + "  ".join(f"{stage} {seconds:.3f}s" for stage, seconds in report['stage_seconds'].items()))
+    dedupe = report['dedupe']
+    if dedupe is not None:
+        print(f"  dedupe: removed {dedupe['removed']}/{dedupe['sentences']} sentences, "
+              f"term matrix non-zeros {dedupe['nnz_before']} -> {dedupe['nnz_after']} "
+              f"({dedupe['shrink']:.1%} smaller)")
+    peak_memory = report['peak_memory_mb']
+    print(f"Benchmarked {report['cases']} cases ({len(report['failed'])} failed, "
+          f"{report['scored_cases']} with human summaries) - {report['cases_per_sec']:.2f} cases/sec, "
+          f"peak memory {f'{peak_memory:.1f} MB' if peak_memory is not None else 'n/a'}. "
+          f"Report written to {args.report}")
+    return 1 if report['failed'] else 0
+
+
+def import_time(args):
+    report = measure_import_time('main', args.budget_ms, args.repeats)
+    for entry in report['slowest']:
+        print(f"{entry['self_ms']:>8.2f} ms  {entry['module']}")
+    if report['deferred_imported']:
+        print(f"Imported at startup but should load on first use: {', '.join(report['deferred_imported'])}")
+    print(f"import {report['module']}: {report['ms']:.1f} ms (budget {report['budget_ms']:g} ms) - "
+          f"{'ok' if report['ok'] else 'FAILED'}")
+    return 0 if report['ok'] else 1
+
+
+def similar(args, parser):
+    if (args.case is None) == (args.file is None):
+        parser.error("similar takes either a case or --file")
+    config = make_config(vectorizer_path=args.vectorizer, units=args.units, headings_path=args.headings,
+                         lsa_options=lsa_options_from_args(args), index_path=args.index or DEFAULT_INDEX_PATH)
+    if args.file is not None and not args.vectorizer:
+        parser.error("similar --file needs the --vectorizer the index was built with")
+    try:
+        if args.file is not None:
+            # Opening the index checks that --vectorizer is the one it was built with
+            index = get_index(config)
+            with open(args.file, 'r', encoding='utf-8') as file:
+                vector = text_vector(file.read(), config)
+            start = time.perf_counter()
+            matches = index.query(vector, args.top)
+        else:
+            index = CaseIndex(config['index_path'])
+            start = time.perf_counter()
+            matches = index.similar_to(args.case, args.top)
+    except (KeyError, ValueError) as error:
+        print(error.args[0])
+        return 1
+    elapsed = time.perf_counter() - start
+
+    for rank, match in enumerate(matches, start=1):
+        print(f"{rank:>4}  {match['score']:.4f}  {match['case_id']}")
+    print(f"{len(matches)} of {len(index)} indexed decisions in {elapsed * 1000:.2f} ms")
+    return 0
+
+
+def config_from_args(args) -> dict:
+    return make_config(
+        output_name=args.output_name,
+        lsa_options=lsa_options_from_args(args),
+        vectorizer_path=args.vectorizer,
+        units=args.units,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_max_bytes=int(args.cache_max_mb * 1024 * 1024),
+        force=args.force,
+        metrics_jsonl=args.metrics_jsonl,
+        metrics_prom=args.metrics_prom,
+        svd_batch_size=args.svd_batch_size,
+        store_path=args.store,
+        headings_path=args.headings,
+        corpus_path=args.corpus_pack,
+        index_path=args.index,
+    )
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in (None, 'watch') and args.index and not args.vectorizer:
+        parser.error("--index needs a corpus --vectorizer so that case vectors share one term space")
+    if args.command in (None, 'watch') and args.svd_batch_size > 1 and args.svd_algorithm != 'arpack':
+        parser.error("--svd-batch-size only gives the per-case ranking with --svd-algorithm arpack")
+
+    if args.command == 'fit-vectorizer':
+        return fit_vectorizer(args)
+    if args.command == 'pack-corpus':
+        return pack(args)
+    if args.command == 'benchmark':
+        return benchmark(args)
+    if args.command == 'import-time':
+        return import_time(args)
+    if args.command == 'sweep':
+        return sweep(args)
+    if args.command == 'serve':
+        service = SummarizationService(pipeline_config_from_args(args), args.workers, args.max_pending)
+        service.run(args.host, args.port)
+        return 0
+    if args.command == 'watch':
+        watcher = CaseWatcher(args.input_root, config_from_args(args), args.workers, args.checkpoint,
+                              args.debounce, args.poll_interval, use_inotify=not args.poll)
+        watcher.run()
+        print(f"Summarized {watcher.summarized} cases ({watcher.failed} failed)")
+        return 0
+    if args.command == 'query':
+        store = SentenceStore(args.store or DEFAULT_STORE_PATH)
+        try:
+            result = store.query_summary(args.case, args.sentences, args.facts_pct, args.issues_pct, args.rulings_pct)
+        except KeyError as error:
+            print(error.args[0])
+            return 1
+        print(result['summary'])
+        return 0
+    if args.command == 'similar':
+        return similar(args, parser)
+    if args.command == 'prepare-resources':
+        prepare_resources(args.data_dir)
+        print(f"NLTK resources ready in {args.data_dir}")
+        return 0
+
+    report = run_batch(args.input_root, args.workers, config_from_args(args))
+
+    print(f"Summarized {report['succeeded']}/{report['cases']} cases "
+          f"({report['cached']} from cache, {report['failed']} failed) in {report['seconds']:.2f}s "
+          f"- {report['cases_per_sec']:.2f} cases/sec")
+    return 1 if report['failed'] else 0
+
 
-segmenter = PartSegmentation()
-preprocessor = Preprocessing()
-
-# Path to the main folder containing all court cases
-main_folder_path = "Court_Cases"
-
-# Loop through each folder inside the main folder
-for folder_name in os.listdir(main_folder_path):
-    folder_path = os.path.join(main_folder_path, folder_name)
-    
-    if os.path.isdir(folder_path):
-        case_file_path = os.path.join(folder_path, 'court case.txt')
-        
-        if os.path.isfile(case_file_path):
-            # Read and segment the text
-            text = segmenter.read_file(case_file_path)
-            sections = segmenter.segment_by_headings(text)
-
-            # Preprocess the segmented sections
-            preprocessed_sections = preprocessor.preprocess_sections(sections)
-
-            # Define the percentages for each section of the summary
-            section_percentages = {
-                'title': 1,  
-                'facts': 0.50,
-                'issues': 0.05,
-                'rulings': 0.45
-            }
-
-            # Collect all heading keywords for exclusion in the summary
-            headings = {
-                'title': segmenter.title_headings,
-                'facts': segmenter.facts_headings,
-                'issues': segmenter.issues_headings,
-                'rulings': segmenter.ruling_headings
-            }
-            
-            lsa = LSA(sections)
-            summary = lsa.create_summary()
-            
-            # Path to save the summary file
-            summary_file_path = os.path.join(folder_path, 'summit_summary.txt')
-            
-            lsa.save_summary(summary_file_path, summary)
\ No newline at end of file
+if __name__ == "__main__":
+    raise SystemExit(main())